@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import serial
 import time
-from datetime import datetime
 
 # Configure UART
 ser = serial.Serial(
@@ -11,29 +10,45 @@ ser = serial.Serial(
     write_timeout=2
 )
 
+# Send period; pacing uses absolute integer-nanosecond deadlines so
+# wake-up jitter does not accumulate over time
+PERIOD_NS = 5_000_000
+
 print("Sending current time over UART. Press Ctrl+C to stop.\n")
 count = 0
+stuck = False  # Set when a write timed out; flush() would then never return
+t_next_ns = time.monotonic_ns()
 try:
     while True:
         # Prepare message
         count += 1
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         message = f"10000000{count}\r\n"
 
-        # Write and flush
+        # Write; no flush() here, it blocks until the UART has drained
         ser.write(message.encode("utf-8"))
-        ser.flush()  # Ensure all bytes are transmitted
-
-        print(f"Sent: {message.strip()}")
 
-        # Optional: small delay to prevent overwhelming slow receivers
-        time.sleep(0.005)
+        # Optional: small delay to prevent overwhelming slow receivers.
+        # No per-message print here: terminal writes can overrun the period.
+        t_next_ns += PERIOD_NS
+        delay_ns = t_next_ns - time.monotonic_ns()
+        if delay_ns > 0:
+            time.sleep(delay_ns / 1e9)
+        else:
+            # Fell behind (blocked write, descheduled): restart the schedule
+            # from now rather than sending the missed messages back to back
+            t_next_ns = time.monotonic_ns()
 
 except KeyboardInterrupt:
     print("\nStopped by user.")
 
 except serial.SerialTimeoutException:
     print("⚠️ Serial write timeout — the UART buffer may be full.")
+    stuck = True
 
 finally:
+    print(f"Sent {count} messages.")
+    if stuck:
+        ser.reset_output_buffer()  # Drop what can't be sent instead of waiting
+    else:
+        ser.flush()  # Ensure all bytes are transmitted before closing
     ser.close()
@@ -3,8 +3,9 @@
 Debug version of live plotter - Single device only
 Reads from one serial port and displays real-time graph
 """
-import sys, time, collections, os, csv
+import sys, time, os, threading, struct
 from PySide6 import QtCore, QtWidgets
+import numpy as np
 import pyqtgraph as pg
 import serial, serial.tools.list_ports
 try:
@@ -12,54 +13,250 @@ try:
 except ImportError:
     yaml = None
 
+try:
+    from PySide6 import QtSerialPort
+except ImportError:
+    QtSerialPort = None
+try:
+    import termios, fcntl
+except ImportError:
+    termios = fcntl = None  # Windows
+
+# Linux serial ioctls, used to switch USB-serial adapters to low latency
+TIOCGSERIAL = 0x541E
+TIOCSSERIAL = 0x541F
+ASYNC_LOW_LATENCY = 0x2000
+_SERIAL_FLAGS_OFFSET = 16  # struct serial_struct: int type, line; uint port; int irq, flags
+
+# CSV log layout; rows are buffered as floats and formatted in blocks
+LOG_HEADER = "timestamp_iso,timestamp_epoch,t_rel_s,value_raw,value_clipped"
+LOG_FMT = ["%s", "%.6f", "%.6f", "%.6f", "%.6f"]
+LOG_BLOCK_ROWS = 8192
+
+
+class SampleRing:
+    """Fixed-size ring buffer of (timestamp, value) samples.
+
+    Written by a reader, drained in bulk by the GUI timer; the lock makes it
+    safe to use across threads.
+    """
+
+    def __init__(self, capacity: int = 65536):
+        self._lock = threading.Lock()
+        self._ts_buf = np.empty(capacity, dtype=np.float64)
+        self._v_buf = np.empty(capacity, dtype=np.float64)
+        # head/tail are running sample counts, not indices
+        self._head = 0
+        self._tail = 0
+
+    def push(self, ts, values):
+        """Append samples sharing one timestamp"""
+        cap = self._ts_buf.size
+        with self._lock:
+            head = self._head
+            for value in values:
+                i = head % cap
+                self._ts_buf[i] = ts
+                self._v_buf[i] = value
+                head += 1
+            self._head = head
+
+    def drain(self):
+        """Return (timestamps, values) pushed since the last call.
+
+        If more than `capacity` samples arrived in between, the oldest are lost.
+        """
+        cap = self._ts_buf.size
+        with self._lock:
+            head = self._head
+            tail = max(self._tail, head - cap)
+            self._tail = head
+            idx = np.arange(tail, head) % cap
+            return self._ts_buf[idx], self._v_buf[idx]
+
+
+def _set_read_min_one_byte(ser):
+    """On POSIX, make read() return as soon as one byte is available.
+
+    Sets VMIN=1, VTIME=0 so the blocking read never waits on the inter-byte
+    timer and never returns empty while the port is open.
+    """
+    if termios is None:
+        return
+    try:
+        fd = ser.fileno()
+        attrs = termios.tcgetattr(fd)
+        attrs[6][termios.VMIN] = 1
+        attrs[6][termios.VTIME] = 0
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    except (termios.error, OSError, AttributeError) as e:
+        print(f"Could not set VMIN/VTIME on {ser.port}: {e}")
+
+
+def _set_low_latency(fd):
+    """On Linux, set ASYNC_LOW_LATENCY on a serial port.
+
+    FTDI/CH340 adapters otherwise batch data on a 16 ms latency timer.
+    Best effort: ports that don't support TIOCGSERIAL are left untouched.
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return
+    try:
+        ss = bytearray(128)  # larger than struct serial_struct on any ABI
+        fcntl.ioctl(fd, TIOCGSERIAL, ss)
+        flags, = struct.unpack_from("i", ss, _SERIAL_FLAGS_OFFSET)
+        if not flags & ASYNC_LOW_LATENCY:
+            struct.pack_into("i", ss, _SERIAL_FLAGS_OFFSET, flags | ASYNC_LOW_LATENCY)
+            fcntl.ioctl(fd, TIOCSSERIAL, ss)
+    except OSError:
+        pass
+
+
+def _split_values(buf: bytearray):
+    """Remove complete lines from buf and return the numbers parsed from them.
+
+    A trailing partial line is left in buf for the next read.
+    """
+    end = buf.rfind(b"\n")
+    if end < 0:
+        return []
+    lines = buf[:end].split(b"\n")
+    del buf[:end + 1]
+    
+    values = []
+    for raw in lines:
+        # Parse value (expect just a number)
+        try:
+            values.append(float(raw))
+        except ValueError:
+            continue  # Skip invalid lines
+    return values
+
+
 class SerialReader(QtCore.QThread):
-    """Thread to read from serial port"""
-    data_received = QtCore.Signal(str, float, float)  # port, timestamp, value
+    """Thread to read from serial port with pyserial.
+
+    Samples are written into a SampleRing instead of being emitted one by
+    one; the GUI collects them in bulk with drain().
+    """
     disconnected = QtCore.Signal(str)  # port
 
-    def __init__(self, port_name: str, baud: int = 115200, parent=None):
+    def __init__(self, port_name: str, baud: int = 115200, capacity: int = 65536, parent=None):
         super().__init__(parent)
         self._port_name = port_name
         self._baud = baud
         self._stop = False
         self._last_data_ts = 0.0
+        self._ser = None
+        self._ring = SampleRing(capacity)
 
     def run(self):
         """Main loop: read serial data"""
         try:
-            ser = serial.Serial(self._port_name, self._baud, timeout=1)
+            # Blocking reads: read(1) waits for the first byte, stop() cancels it
+            self._ser = ser = serial.Serial(self._port_name, self._baud, timeout=None)
         except Exception as e:
             print(f"Failed to open {self._port_name}: {e}")
             self.disconnected.emit(self._port_name)
             return
+        _set_read_min_one_byte(ser)
+        _set_low_latency(ser.fileno())
         
+        buf = bytearray()
         with ser:
             while not self._stop:
                 try:
-                    line = ser.readline().decode(errors="ignore").strip()
-                    if not line:
-                        continue
-                    
-                    # Parse value (expect just a number)
-                    value = float(line)
-                    ts = time.time()
-                    self.data_received.emit(self._port_name, ts, value)
-                    self._last_data_ts = ts
-                    
-                except ValueError:
-                    continue  # Skip invalid lines
+                    # Wait for one byte, then drain everything already waiting
+                    chunk = ser.read(1)
+                    n = ser.in_waiting
+                    if n:
+                        chunk += ser.read(n)
+                    if not chunk:
+                        continue  # read was cancelled
+                    buf += chunk
                 except Exception as e:
-                    print(f"Read error on {self._port_name}: {e}")
+                    if not self._stop:
+                        print(f"Read error on {self._port_name}: {e}")
                     break
+                
+                values = _split_values(buf)
+                if values:
+                    ts = time.time()
+                    self._ring.push(ts, values)
+                    self._last_data_ts = ts
         
         self.disconnected.emit(self._port_name)
 
+    def drain(self):
+        """Return (timestamps, values) received since the last call"""
+        return self._ring.drain()
+
     def stop(self):
         """Stop the reader thread"""
         self._stop = True
+        if self._ser is not None:
+            try:
+                self._ser.cancel_read()
+            except Exception:
+                pass
         self.wait(500)
 
 
+class QtSerialReader(QtCore.QObject):
+    """Serial reader driven by QSerialPort's readyRead on the GUI event loop.
+
+    Same interface as SerialReader, but without a reader thread: data is
+    parsed when the OS reports it ready and pushed straight into the ring.
+    """
+    disconnected = QtCore.Signal(str)  # port
+
+    def __init__(self, port_name: str, baud: int = 115200, capacity: int = 65536, parent=None):
+        super().__init__(parent)
+        self._port_name = port_name
+        self._last_data_ts = 0.0
+        self._buf = bytearray()
+        self._ring = SampleRing(capacity)
+        
+        self._ser = QtSerialPort.QSerialPort(self)
+        self._ser.setPortName(port_name)
+        self._ser.setBaudRate(baud)
+        self._ser.readyRead.connect(self._on_ready)
+        self._ser.errorOccurred.connect(self._on_error)
+
+    def start(self):
+        """Open the port; data then arrives through readyRead"""
+        if not self._ser.open(QtCore.QIODevice.OpenModeFlag.ReadOnly):
+            print(f"Failed to open {self._port_name}: {self._ser.errorString()}")
+            self.disconnected.emit(self._port_name)
+            return
+        _set_low_latency(self._ser.handle())
+
+    def _on_ready(self):
+        """Read everything available and push the parsed samples"""
+        self._buf += self._ser.readAll().data()
+        values = _split_values(self._buf)
+        if values:
+            ts = time.time()
+            self._ring.push(ts, values)
+            self._last_data_ts = ts
+
+    def _on_error(self, error):
+        """Treat a lost device as a disconnect"""
+        if error == QtSerialPort.QSerialPort.SerialPortError.ResourceError:
+            print(f"Read error on {self._port_name}: {self._ser.errorString()}")
+            self._ser.close()
+            self.disconnected.emit(self._port_name)
+
+    def drain(self):
+        """Return (timestamps, values) received since the last call"""
+        return self._ring.drain()
+
+    def stop(self):
+        """Close the port"""
+        if self._ser.isOpen():
+            self._ser.close()
+
+
 class DebugWindow(QtWidgets.QMainWindow):
     """Simple single-device live plotter"""
     
@@ -77,21 +274,31 @@ class DebugWindow(QtWidgets.QMainWindow):
         self.max_speed = float(max_speed)
         self.min_speed = float(min_speed)
         
-        # Data buffers
-        self.t_buffer = collections.deque(maxlen=self.max_points)
-        self.v_buffer = collections.deque(maxlen=self.max_points)
+        # Data buffers: ring of max_points samples, each stored twice
+        # (at i and i + max_points) so the newest n_points are always one
+        # contiguous slice ending at head + max_points
+        self.t_buffer = np.empty(2 * self.max_points, dtype=np.float64)
+        self.v_buffer = np.empty(2 * self.max_points, dtype=np.float64)
+        self.head = 0
+        self.n_points = 0
         self.t0 = time.time()
         
         # Logging state
         self.logging_active = False
-        self.log_rows = []
+        self.log_file = None
+        self.log_path = None
+        self.log_count = 0
+        # Pending rows: timestamp_epoch, t_rel_s, value_raw, value_clipped
+        self.log_buf = np.empty((LOG_BLOCK_ROWS, 4), dtype=np.float64)
+        self.log_n = 0
         
         # Setup UI
         self._setup_ui()
         
         # Start serial reader
-        self.reader = SerialReader(port, baud=baud)
-        self.reader.data_received.connect(self.on_data)
+        # Prefer QSerialPort (no reader thread); fall back to a pyserial thread
+        reader_cls = QtSerialReader if QtSerialPort is not None else SerialReader
+        self.reader = reader_cls(port, baud=baud)
         self.reader.disconnected.connect(self.on_disconnected)
         self.reader.start()
         
@@ -142,30 +349,85 @@ class DebugWindow(QtWidgets.QMainWindow):
         
         # Create curve
         self.curve = self.plot.plot(pen=pg.mkPen('g', width=2), name=self.name)
+        # Only draw what is on screen, reduced to about one point per pixel
+        self.curve.setDownsampling(auto=True, method='peak')
+        self.curve.setClipToView(True)
         
         # Set initial Y range
         self.plot.setYRange(self.min_speed, self.max_speed, padding=0)
 
-    @QtCore.Slot(str, float, float)
-    def on_data(self, port, ts, value):
-        """Handle incoming data"""
+    def on_data(self, ts, values):
+        """Handle a batch of incoming samples drained from the reader"""
         t_rel = ts - self.t0
         
-        # Clip value to range
-        clipped = max(self.min_speed, min(self.max_speed, value))
+        # Clip values to range
+        clipped = np.clip(values, self.min_speed, self.max_speed)
         
         # Add to buffers
-        self.t_buffer.append(t_rel)
-        self.v_buffer.append(clipped)
+        self._append(t_rel, clipped)
         
         # Update numeric display
-        self.value_label.setText(f"{clipped:.3f} m/s")
+        self.value_label.setText(f"{clipped[-1]:.3f} m/s")
         
         # Logging
         if self.logging_active:
-            iso = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(ts)) + f".{int((ts%1)*1000):03d}Z"
-            row = [iso, f"{ts:.6f}", f"{t_rel:.6f}", f"{value:.6f}", f"{clipped:.6f}"]
-            self.log_rows.append(row)
+            self._log_samples(np.column_stack((ts, t_rel, values, clipped)))
+
+    def _log_samples(self, rows):
+        """Queue numeric log rows, writing out each block as it fills"""
+        while rows.shape[0]:
+            k = min(rows.shape[0], LOG_BLOCK_ROWS - self.log_n)
+            self.log_buf[self.log_n:self.log_n + k] = rows[:k]
+            self.log_n += k
+            rows = rows[k:]
+            if self.log_n == LOG_BLOCK_ROWS:
+                self._flush_log()
+
+    def _flush_log(self):
+        """Format the pending rows and write them to the CSV file"""
+        n = self.log_n
+        if not n or self.log_file is None:
+            return
+        block = self.log_buf[:n]
+        
+        # Local-time ISO stamps, built for the whole block at once. One UTC
+        # offset serves the block unless it spans a DST change; then each
+        # row gets its own.
+        utc_offset = time.localtime(block[0, 0]).tm_gmtoff
+        if time.localtime(block[-1, 0]).tm_gmtoff != utc_offset:
+            utc_offset = np.array([time.localtime(t).tm_gmtoff for t in block[:, 0]],
+                                  dtype=np.float64)
+        ms = np.floor((block[:, 0] + utc_offset) * 1000).astype(np.int64)
+        iso = np.char.add(np.datetime_as_string(ms.astype('datetime64[ms]'), unit='ms'), 'Z')
+        
+        rows = np.empty((n, 5), dtype=object)
+        rows[:, 0] = iso
+        rows[:, 1:] = block
+        np.savetxt(self.log_file, rows, fmt=LOG_FMT, delimiter=',')
+        self.log_count += n
+        self.log_n = 0
+
+    def _append(self, t_rel, clipped):
+        """Append samples to the plot ring, overwriting the oldest when full"""
+        size = self.max_points
+        k = min(t_rel.size, size)
+        t_rel = t_rel[-k:]
+        clipped = clipped[-k:]
+        head = self.head
+        first = min(k, size - head)  # samples before the ring wraps
+        for off in (0, size):
+            self.t_buffer[off + head:off + head + first] = t_rel[:first]
+            self.v_buffer[off + head:off + head + first] = clipped[:first]
+            self.t_buffer[off:off + k - first] = t_rel[first:]
+            self.v_buffer[off:off + k - first] = clipped[first:]
+        self.head = (head + k) % size
+        self.n_points = min(self.n_points + k, size)
+
+    def _view(self):
+        """Return (t, v) views of the buffered samples, oldest first"""
+        end = self.head + self.max_points
+        start = end - self.n_points
+        return self.t_buffer[start:end], self.v_buffer[start:end]
 
     @QtCore.Slot(str)
     def on_disconnected(self, port):
@@ -175,71 +437,87 @@ class DebugWindow(QtWidgets.QMainWindow):
         self.value_label.setStyleSheet("font-size: 36pt; font-weight: 600; color: #f00;")
 
     def refresh(self):
-        """Update plot"""
-        if not self.t_buffer:
+        """Drain new samples and update plot"""
+        ts, values = self.reader.drain()
+        if ts.size:
+            self.on_data(ts, values)
+        
+        # Keep buffering and logging, but skip plot work nobody can see
+        if not self.n_points or not self.isVisible() or self.isMinimized():
             return
         
-        # Update curve
-        t_list = list(self.t_buffer)
-        v_list = list(self.v_buffer)
-        self.curve.setData(t_list, v_list)
+        # Update curve (views into the ring, no copy)
+        t_arr, v_arr = self._view()
+        self.curve.setData(t_arr, v_arr)
         
         # Set rolling window X range
-        latest_ts = t_list[-1]
+        latest_ts = float(t_arr[-1])
         start = max(0.0, latest_ts - self.window_seconds)
-        self.plot.setXRange(start, latest_ts, padding=0)
         
         # Dynamic Y range (fit to visible data)
+        y_range = None
         if latest_ts > 0:
-            t_cut = latest_ts - self.window_seconds
-            visible_values = [v for t, v in zip(t_list, v_list) if t >= t_cut]
-            if visible_values:
-                v_max = max(visible_values)
-                v_min = min(visible_values)
+            i = np.searchsorted(t_arr, latest_ts - self.window_seconds)
+            visible_values = v_arr[i:]
+            if visible_values.size:
+                v_max = float(visible_values.max())
+                v_min = float(visible_values.min())
                 # Add 10% padding
                 padding = (v_max - v_min) * 0.1
-                self.plot.setYRange(v_min - padding, v_max + padding, padding=0)
+                y_range = (v_min - padding, v_max + padding)
+        
+        # Apply both axes in one call so the view is only recomputed once
+        self.plot.setRange(xRange=(start, latest_ts), yRange=y_range, padding=0)
 
     def toggle_logging(self):
         """Start/stop logging"""
         if not self.logging_active:
+            # Ask for the output file up front so rows can be streamed to it
+            path, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Save CSV", "", "CSV Files (*.csv)")
+            if not path:
+                return
+            if not path.lower().endswith('.csv'):
+                path += '.csv'
+            try:
+                self.log_file = open(path, 'w')
+            except Exception as e:
+                print(f"Error opening CSV: {e}")
+                return
+            self.log_path = path
+            self.log_file.write(LOG_HEADER + "\n")
+            self.log_count = 0
+            self.log_n = 0
+            
             # Start logging
             self.logging_active = True
-            self.log_rows = []
             self.btn_log.setText("Stop & Save")
             self.lbl_log_status.setText("Logging: ON")
             self.lbl_log_status.setStyleSheet("color: #0a0;")
         else:
             # Stop logging and save
-            self.logging_active = False
             self.btn_log.setText("Start Logging")
             self.lbl_log_status.setText("Logging: OFF")
             self.lbl_log_status.setStyleSheet("color: #666;")
-            
-            if not self.log_rows:
-                return
-            
-            # Save dialog
-            path, _ = QtWidgets.QFileDialog.getSaveFileName(
-                self, "Save CSV", "", "CSV Files (*.csv)")
-            if not path:
-                return
-            if not path.lower().endswith('.csv'):
-                path += '.csv'
-            
-            # Write CSV
-            try:
-                with open(path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['timestamp_iso', 'timestamp_epoch', 't_rel_s', 'value_raw', 'value_clipped'])
-                    writer.writerows(self.log_rows)
-                print(f"Saved log to {path} ({len(self.log_rows)} rows)")
-            except Exception as e:
-                print(f"Error saving CSV: {e}")
+            self._close_log()
+
+    def _close_log(self):
+        """Finish the CSV file being streamed to"""
+        self.logging_active = False
+        if self.log_file is None:
+            return
+        try:
+            self._flush_log()
+            self.log_file.close()
+            print(f"Saved log to {self.log_path} ({self.log_count} rows)")
+        except Exception as e:
+            print(f"Error saving CSV: {e}")
+        self.log_file = None
 
     def closeEvent(self, event):
         """Clean shutdown"""
         self.reader.stop()
+        self._close_log()
         super().closeEvent(event)
 
 
@@ -1,22 +1,54 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import functools
+import io
 import json
 import math
+import warnings
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 import numpy as np
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
 
 CALIBRATION_FILE = Path("pendulum_calibration.json")
 
+# Rows processed per chunk; bounds memory use on large logs
+DEFAULT_CHUNK_ROWS = 100_000
+IO_BUFFER_BYTES = 1 << 20
+DEG2RAD = math.pi / 180.0
+
+
+@functools.lru_cache(maxsize=None)
+def _load_json_cached(path: Path, mtime: float) -> dict:
+    # mtime is part of the cache key so an edited file is re-read.
+    # The returned dict is shared between callers; don't modify it.
+    with path.open("r") as f:
+        return json.load(f)
 
-def load_calibration(model_name: str):
-    if not CALIBRATION_FILE.exists():
+
+def _load_calibration_data() -> dict:
+    try:
+        mtime = CALIBRATION_FILE.stat().st_mtime
+    except FileNotFoundError:
         raise SystemExit(f"Calibration file not found: {CALIBRATION_FILE}")
-    with CALIBRATION_FILE.open("r") as f:
-        data = json.load(f)
+    return _load_json_cached(CALIBRATION_FILE, mtime)
+
+
+def load_calibration(model_name: str, data: dict = None):
+    if data is None:
+        data = _load_calibration_data()
 
     models = data.get("models", {})
     recommended = data.get("recommended_model")
@@ -47,18 +79,27 @@ def load_calibration(model_name: str):
     raise SystemExit(f"Unknown model name: {model_name}")
 
 
-def compute_speed_from_angle(theta_deg: float, model_name: str, params: dict) -> float:
-    # theta is angle in degrees; convert to radians and use absolute value
-    angle_rad = math.radians(abs(theta_deg))
-    if angle_rad <= 0:
+def compute_speed_from_angle(
+    theta_deg: float,
+    model_name: str,
+    params: dict,
+    _tan=math.tan,
+    _sqrt=math.sqrt,
+) -> float:
+    # The math functions are bound as defaults so per-sample callers get
+    # local lookups instead of module attribute lookups.
+    # A pendulum at rest reads exactly 0; skip the trig for it. NaN is
+    # truthy and still propagates to a NaN speed.
+    if not theta_deg:
         return 0.0
-    tan_theta = math.tan(angle_rad)
+    # theta is angle in degrees; convert to radians and use absolute value
+    tan_theta = _tan(abs(theta_deg) * DEG2RAD)
     if tan_theta <= 0:
         return 0.0
 
     if model_name == "single":
         C = params["C"]
-        return C * math.sqrt(tan_theta)
+        return C * _sqrt(tan_theta)
     elif model_name == "double":
         A = params["A"]
         p = params["p"]
@@ -67,10 +108,260 @@ def compute_speed_from_angle(theta_deg: float, model_name: str, params: dict) ->
         raise ValueError(f"Unsupported model: {model_name}")
 
 
-def process_log(in_path: Path, out_path: Path, model_name: str, params: dict, add_both: bool = False):
-    with in_path.open("r", newline="") as f_in, out_path.open("w", newline="") as f_out:
+def make_speed_function(model_name: str, params: dict):
+    """Return speed(theta_deg) with the model and its parameters bound.
+
+    Same results as compute_speed_from_angle, but the model dispatch and
+    parameter lookups happen once here instead of on every sample, e.g.
+    speed = make_speed_function(*load_calibration("auto")).
+    """
+    if model_name == "single":
+        C = float(params["C"])
+
+        def speed(theta_deg: float, _tan=math.tan, _sqrt=math.sqrt, _k=DEG2RAD) -> float:
+            if not theta_deg:
+                return 0.0
+            tan_theta = _tan(abs(theta_deg) * _k)
+            if tan_theta <= 0:
+                return 0.0
+            return C * _sqrt(tan_theta)
+
+        return speed
+
+    if model_name == "double":
+        A = float(params["A"])
+        p = float(params["p"])
+
+        def speed(theta_deg: float, _tan=math.tan, _k=DEG2RAD) -> float:
+            if not theta_deg:
+                return 0.0
+            tan_theta = _tan(abs(theta_deg) * _k)
+            if tan_theta <= 0:
+                return 0.0
+            return A * tan_theta ** p
+
+        return speed
+
+    raise ValueError(f"Unsupported model: {model_name}")
+
+
+def _speed_single(theta_deg: float, C: float) -> float:
+    tan_theta = math.tan(math.radians(abs(theta_deg)))
+    if tan_theta <= 0:
+        return 0.0
+    return C * math.sqrt(tan_theta)
+
+
+def _speed_double(theta_deg: float, A: float, p: float) -> float:
+    tan_theta = math.tan(math.radians(abs(theta_deg)))
+    if tan_theta <= 0:
+        return 0.0
+    return A * tan_theta ** p
+
+
+# With numba, compile the per-angle kernels into parallel ufuncs. fastmath is
+# left off so NaN angles still propagate to NaN speeds.
+if numba is not None:
+    _speed_single_ufunc = numba.vectorize(
+        ["float64(float64, float64)"], target="parallel", cache=True)(_speed_single)
+    _speed_double_ufunc = numba.vectorize(
+        ["float64(float64, float64, float64)"], target="parallel", cache=True)(_speed_double)
+else:
+    _speed_single_ufunc = _speed_double_ufunc = None
+
+
+def compute_speed_array(theta_deg: np.ndarray, model_name: str, params: dict) -> np.ndarray:
+    """Vectorised compute_speed_from_angle over an array of angles in degrees.
+
+    NaN angles give NaN speeds; angles with tan(|theta|) <= 0 give 0.
+    Uses the numba kernels when numba is installed, NumPy ufuncs otherwise.
+    """
+    theta = np.asarray(theta_deg, dtype=float)
+    if numba is not None:
+        if model_name == "single":
+            return _speed_single_ufunc(theta, params["C"])
+        if model_name == "double":
+            return _speed_double_ufunc(theta, params["A"], params["p"])
+        raise ValueError(f"Unsupported model: {model_name}")
+
+    return _speed_from_tan(_tan_abs(theta), model_name, params)
+
+
+def _tan_abs(theta_deg: np.ndarray) -> np.ndarray:
+    return np.tan(np.deg2rad(np.abs(theta_deg)))
+
+
+def _speed_from_tan(tan_theta: np.ndarray, model_name: str, params: dict) -> np.ndarray:
+    """NumPy model evaluation from precomputed tan(|theta|)."""
+    with np.errstate(invalid="ignore", over="ignore"):
+        if model_name == "single":
+            v = params["C"] * np.sqrt(tan_theta)
+        elif model_name == "double":
+            v = params["A"] * np.power(tan_theta, params["p"])
+        else:
+            raise ValueError(f"Unsupported model: {model_name}")
+        v[tan_theta <= 0] = 0.0
+    return v
+
+
+def _parse_floats(cells: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse CSV cells to floats. Returns (values, ok) with NaN where not ok."""
+    cells = [cell.strip() for cell in cells]
+    ok = np.array([bool(cell) for cell in cells], dtype=bool)
+    try:
+        # One C-level conversion for the whole column; blanks become NaN
+        values = np.array([cell or "nan" for cell in cells], dtype=float)
+        return values, ok
+    except ValueError:
+        pass
+
+    # Some cell is not a number: fall back to parsing cell by cell
+    nan = math.nan
+    _float = float
+    values = [nan] * len(cells)
+    for i, cell in enumerate(cells):
+        if not cell:
+            continue
+        try:
+            values[i] = _float(cell)
+        except ValueError:
+            ok[i] = False
+    return np.array(values, dtype=float), ok
+
+
+def _format_column(values: np.ndarray, fmt: str, mask: np.ndarray) -> List[str]:
+    """Format values with fmt where mask is set, empty string elsewhere."""
+    return [fmt % x if m else "" for x, m in zip(values.tolist(), mask.tolist())]
+
+
+def _error_columns(v_est: np.ndarray, gt: np.ndarray, gt_ok: np.ndarray) -> Tuple[List[str], List[str]]:
+    """Absolute (m/s) and percentage error columns against ground truth."""
+    has_err = gt_ok & np.isfinite(v_est)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        err = v_est - gt
+        err_pct = np.where(gt != 0, err / gt * 100.0, np.nan)
+    return _format_column(err, "%.6f", has_err), _format_column(err_pct, "%.3f", has_err)
+
+
+def _calibrated_columns(
+    theta_deg: np.ndarray,
+    gt: np.ndarray,
+    gt_ok: np.ndarray,
+    model_name: str,
+    params: dict,
+    add_both: bool,
+) -> Dict[str, List[str]]:
+    """Compute the new output columns (name -> formatted cells) for a log."""
+    if add_both:
+        if numba is not None:
+            v_single = compute_speed_array(theta_deg, "single", params["single"])
+            v_double = compute_speed_array(theta_deg, "double", params["double"])
+        else:
+            # Both models share tan(|theta|); compute it once
+            tan_theta = _tan_abs(np.asarray(theta_deg, dtype=float))
+            v_single = _speed_from_tan(tan_theta, "single", params["single"])
+            v_double = _speed_from_tan(tan_theta, "double", params["double"])
+        es_mps, es_pct = _error_columns(v_single, gt, gt_ok)
+        ed_mps, ed_pct = _error_columns(v_double, gt, gt_ok)
+        return {
+            "student_single_mps": _format_column(v_single, "%.6f", np.isfinite(v_single)),
+            "student_double_mps": _format_column(v_double, "%.6f", np.isfinite(v_double)),
+            "err_single_mps": es_mps,
+            "err_double_mps": ed_mps,
+            "err_single_pct": es_pct,
+            "err_double_pct": ed_pct,
+        }
+
+    # Single chosen model
+    v_est = compute_speed_array(theta_deg, model_name, params)
+    err_mps, err_pct = _error_columns(v_est, gt, gt_ok)
+    return {
+        f"student_{model_name}_mps": _format_column(v_est, "%.6f", np.isfinite(v_est)),
+        f"err_{model_name}_mps": err_mps,
+        f"err_{model_name}_pct": err_pct,
+    }
+
+
+def process_log(
+    in_path: Path,
+    out_path: Path,
+    model_name: str,
+    params: dict,
+    add_both: bool = False,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+):
+    """Write out_path: in_path plus calibrated speed/error columns.
+
+    The log is processed chunk_rows rows at a time, so memory use does not
+    grow with the size of the log.
+    """
+    header = _read_header(in_path) if pd is not None else None
+    # Repeated column names would come back renamed (a, a.1): csv module
+    if header and len(set(header)) == len(header):
+        try:
+            with warnings.catch_warnings():
+                # A first row with extra cells is truncated with only a warning
+                warnings.simplefilter("error", pd.errors.ParserWarning)
+                _process_log_pandas(in_path, out_path, header, model_name, params, add_both, chunk_rows)
+            return
+        except (pd.errors.ParserError, pd.errors.ParserWarning, pd.errors.EmptyDataError):
+            # Ragged rows (more fields than the header) or no data rows:
+            # the csv module writes those back as they are
+            pass
+    _process_log_csv(in_path, out_path, model_name, params, add_both, chunk_rows)
+
+
+def _read_header(in_path: Path):
+    """Column names from the first row, or None for an empty file."""
+    with in_path.open("r", newline="") as f:
+        return next(csv.reader(f), None)
+
+
+# Spare column that catches cells beyond the header. pandas silently drops
+# such cells when they start a chunk, instead of raising ParserError.
+_OVERFLOW = "\0overflow"
+
+
+def _process_log_pandas(
+    in_path: Path, out_path: Path, header: List[str], model_name: str, params: dict,
+    add_both: bool, chunk_rows: int
+):
+    if "student_mps" not in header:
+        raise SystemExit("Input CSV does not contain 'student_mps' column.")
+
+    # Read every cell as text so existing columns are written back unchanged.
+    # Names are given explicitly and index_col=False, so column 0 is never
+    # taken as the index when a row has one more field than the header.
+    chunks = pd.read_csv(in_path, dtype=str, keep_default_na=False, header=None, skiprows=1,
+                         names=header + [_OVERFLOW], index_col=False, chunksize=chunk_rows)
+
+    with chunks, out_path.open("w", newline="", buffering=IO_BUFFER_BYTES) as f_out:
+        for i, df in enumerate(chunks):
+            if (df.pop(_OVERFLOW) != "").any():
+                raise pd.errors.ParserError("Row with more fields than the header")
+
+            theta_deg = pd.to_numeric(df["student_mps"], errors="coerce").to_numpy(dtype=float)
+            if "ground_truth_mps" in df.columns:
+                # Same rules as the csv path: a literal "nan" is a value
+                # (errors come out as nan), only blanks/junk are missing
+                gt, gt_ok = _parse_floats(df["ground_truth_mps"].tolist())
+            else:
+                gt = np.full(len(df), np.nan)
+                gt_ok = np.zeros(len(df), dtype=bool)
+
+            for name, cells in _calibrated_columns(theta_deg, gt, gt_ok, model_name, params, add_both).items():
+                df[name] = cells
+            df.to_csv(f_out, index=False, header=(i == 0), lineterminator="\r\n")
+
+
+def _process_log_csv(
+    in_path: Path, out_path: Path, model_name: str, params: dict, add_both: bool, chunk_rows: int
+):
+    with in_path.open("r", newline="", buffering=IO_BUFFER_BYTES) as f_in, \
+            out_path.open("w", newline="", buffering=IO_BUFFER_BYTES) as f_out:
         reader = csv.reader(f_in)
-        writer = csv.writer(f_out)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
         try:
             header = next(reader)
         except StopIteration:
@@ -89,101 +380,50 @@ def process_log(in_path: Path, out_path: Path, model_name: str, params: dict, ad
         if idx_student is None:
             raise SystemExit("Input CSV does not contain 'student_mps' column.")
 
-        # Extend header with new columns
-        new_cols: List[str] = []
-        if add_both:
-            new_cols.extend([
-                "student_single_mps",
-                "student_double_mps",
-                "err_single_mps",
-                "err_double_mps",
-                "err_single_pct",
-                "err_double_pct",
-            ])
-        else:
-            new_cols.extend([
-                f"student_{model_name}_mps",
-                f"err_{model_name}_mps",
-                f"err_{model_name}_pct",
-            ])
-        writer.writerow(header + new_cols)
+        def write_chunk(rows: List[List[str]], write_header: bool):
+            # Parse student angle and ground truth columns in one go
+            theta_deg, _ = _parse_floats([row[idx_student] for row in rows])
+            if idx_gt is not None:
+                gt, gt_ok = _parse_floats([row[idx_gt] for row in rows])
+            else:
+                gt = np.full(len(rows), np.nan)
+                gt_ok = np.zeros(len(rows), dtype=bool)
+
+            new_columns = _calibrated_columns(theta_deg, gt, gt_ok, model_name, params, add_both)
+            buf.seek(0)
+            buf.truncate()
+            if write_header:
+                # Extend header with new columns
+                writer.writerow(header + list(new_columns))
+            # The new cells are plain numbers, so most rows can be joined
+            # directly; anything csv.writer would quote goes through it.
+            write = buf.write
+            for row, extra in zip(rows, zip(*new_columns.values())):
+                out_row = row + list(extra)
+                line = ",".join(out_row)
+                if (line.count(",") != len(out_row) - 1
+                        or '"' in line or "\n" in line or "\r" in line):
+                    writer.writerow(out_row)
+                else:
+                    write(line)
+                    write("\r\n")
+            f_out.write(buf.getvalue())
 
+        rows: List[List[str]] = []
+        first = True
         for row in reader:
             if not row:
                 continue
             if len(row) < len(header):
                 # pad short rows
                 row = row + ["" for _ in range(len(header) - len(row))]
-
-            # Parse student angle
-            theta_str = row[idx_student].strip() if idx_student is not None else ""
-            if theta_str:
-                try:
-                    theta_deg = float(theta_str)
-                except ValueError:
-                    theta_deg = float("nan")
-            else:
-                theta_deg = float("nan")
-
-            gt_val = None
-            if idx_gt is not None and 0 <= idx_gt < len(row):
-                gt_str = row[idx_gt].strip()
-                if gt_str:
-                    try:
-                        gt_val = float(gt_str)
-                    except ValueError:
-                        gt_val = None
-
-            # Compute speeds and errors
-            new_values: List[str] = []
-            if add_both:
-                # Single model
-                try:
-                    v_single = compute_speed_from_angle(theta_deg, "single", params["single"])
-                except Exception:
-                    v_single = float("nan")
-                # Double model
-                try:
-                    v_double = compute_speed_from_angle(theta_deg, "double", params["double"])
-                except Exception:
-                    v_double = float("nan")
-
-                def err_pair(v_est: float):
-                    if gt_val is None or not math.isfinite(v_est):
-                        return "", ""
-                    err = v_est - gt_val
-                    err_pct = (err / gt_val * 100.0) if gt_val != 0 else float("nan")
-                    return f"{err:.6f}", f"{err_pct:.3f}"
-
-                es_mps, es_pct = err_pair(v_single)
-                ed_mps, ed_pct = err_pair(v_double)
-
-                new_values.extend([
-                    f"{v_single:.6f}" if math.isfinite(v_single) else "",
-                    f"{v_double:.6f}" if math.isfinite(v_double) else "",
-                    es_mps,
-                    ed_mps,
-                    es_pct,
-                    ed_pct,
-                ])
-            else:
-                # Single chosen model
-                v_est = compute_speed_from_angle(theta_deg, model_name, params)
-                if gt_val is not None and math.isfinite(v_est):
-                    err = v_est - gt_val
-                    err_pct = (err / gt_val * 100.0) if gt_val != 0 else float("nan")
-                    err_str = f"{err:.6f}"
-                    err_pct_str = f"{err_pct:.3f}"
-                else:
-                    err_str = ""
-                    err_pct_str = ""
-                new_values.extend([
-                    f"{v_est:.6f}" if math.isfinite(v_est) else "",
-                    err_str,
-                    err_pct_str,
-                ])
-
-            writer.writerow(row + new_values)
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                write_chunk(rows, first)
+                rows = []
+                first = False
+        if rows or first:
+            write_chunk(rows, first)
 
 
 def main() -> None:
@@ -206,7 +446,16 @@ def main() -> None:
         ),
     )
 
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help=f"Rows to process at a time; bounds memory on large logs (default: {DEFAULT_CHUNK_ROWS})",
+    )
+
     args = parser.parse_args()
+    if args.chunk_rows < 1:
+        raise SystemExit("--chunk-rows must be at least 1")
     in_path: Path = args.log
     if not in_path.exists():
         raise SystemExit(f"Log file not found: {in_path}")
@@ -214,8 +463,9 @@ def main() -> None:
     # Load calibration
     if args.model == "both":
         # For both, we need parameters for both models
-        _, single_params = load_calibration("single")
-        _, double_params = load_calibration("double")
+        data = _load_calibration_data()
+        _, single_params = load_calibration("single", data)
+        _, double_params = load_calibration("double", data)
         params = {"single": single_params, "double": double_params}
         model_name = "both"
     else:
@@ -231,7 +481,10 @@ def main() -> None:
     else:
         print(f"Using model:   {model_name}")
 
-    process_log(in_path, out_path, model_name, params, add_both=(model_name == "both"))
+    process_log(
+        in_path, out_path, model_name, params,
+        add_both=(model_name == "both"), chunk_rows=args.chunk_rows,
+    )
     print("Done.")
 
 
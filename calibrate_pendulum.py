@@ -8,6 +8,11 @@ import math
 import sys
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 CALIBRATION_FILE = "pendulum_calibration.json"
 
 def calculate_calibration_constant(angle_deg, wind_speed_mps):
@@ -59,8 +64,13 @@ def save_calibration(C, angle_measurements, wind_measurements, notes=""):
         "notes": notes
     }
     
-    with open(CALIBRATION_FILE, 'w') as f:
-        json.dump(calibration_data, f, indent=2)
+    if orjson is not None:
+        Path(CALIBRATION_FILE).write_bytes(
+            orjson.dumps(calibration_data, option=orjson.OPT_INDENT_2, default=float)
+        )
+    else:
+        with open(CALIBRATION_FILE, 'w') as f:
+            json.dump(calibration_data, f, indent=2)
     
     print(f"✓ Calibration saved to {CALIBRATION_FILE}")
     print(f"  Calibration constant C = {C:.6f}")
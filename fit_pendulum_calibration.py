@@ -1,13 +1,38 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
 import csv
+import io
 import json
 import math
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 
 import numpy as np
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+MISSING_COLUMNS_MSG = (
+    "CSV does not contain required columns 'ground_truth_mps' and "
+    "'student_mps'. Make sure you used Testing_mac.py with two "
+    "devices and fixed-rate logging enabled."
+)
+
 
 def load_aligned_log(csv_path: Path) -> Tuple[np.ndarray, np.ndarray]:
     """Load ground truth speed and student angle from an aligned CSV log.
@@ -17,8 +42,36 @@ def load_aligned_log(csv_path: Path) -> Tuple[np.ndarray, np.ndarray]:
         timestamp_iso, timestamp_epoch, ground_truth_mps, student_mps, ...
 
     During calibration runs, student_mps is interpreted as pendulum angle in
-    degrees.
+    degrees. Uses pandas' C parser when available.
     """
+    if pd is None:
+        return _load_aligned_log_csv(csv_path)
+
+    try:
+        # index_col=False: a first row with an extra trailing field must not
+        # turn column 0 into the index and shift every value left
+        df = pd.read_csv(csv_path, usecols=["ground_truth_mps", "student_mps"], index_col=False,
+                         engine="c")
+    except pd.errors.EmptyDataError:
+        raise RuntimeError(f"Empty CSV file: {csv_path}")
+    except pd.errors.ParserError:
+        # Ragged rows: let the csv module skip them
+        return _load_aligned_log_csv(csv_path)
+    except ValueError as e:
+        raise RuntimeError(MISSING_COLUMNS_MSG) from e
+
+    # Non-numeric cells become NaN and are dropped with the empty ones
+    gt = pd.to_numeric(df["ground_truth_mps"], errors="coerce").to_numpy(dtype=float)
+    student = pd.to_numeric(df["student_mps"], errors="coerce").to_numpy(dtype=float)
+    valid = ~(np.isnan(gt) | np.isnan(student))
+    if not valid.any():
+        raise RuntimeError(f"No valid data rows found in {csv_path}")
+
+    return student[valid], gt[valid]
+
+
+def _load_aligned_log_csv(csv_path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """csv-module version of load_aligned_log (no pandas, or ragged rows)."""
     with csv_path.open("r", newline="") as f:
         reader = csv.reader(f)
         try:
@@ -30,11 +83,7 @@ def load_aligned_log(csv_path: Path) -> Tuple[np.ndarray, np.ndarray]:
             idx_gt = header.index("ground_truth_mps")
             idx_student = header.index("student_mps")
         except ValueError as e:
-            raise RuntimeError(
-                "CSV does not contain required columns 'ground_truth_mps' and "
-                "'student_mps'. Make sure you used Testing_mac.py with two "
-                "devices and fixed-rate logging enabled."
-            ) from e
+            raise RuntimeError(MISSING_COLUMNS_MSG) from e
 
         gt_vals: List[float] = []
         student_vals: List[float] = []
@@ -72,18 +121,18 @@ def _filter_data(
     theta = np.asarray(theta_deg, dtype=float)
     v = np.asarray(v_gt, dtype=float)
 
-    mask = np.isfinite(theta) & np.isfinite(v)
-    theta = theta[mask]
-    v = v[mask]
-
-    theta_rad = np.abs(np.deg2rad(theta))
-    tan_theta = np.tan(theta_rad)
-
+    # Cheap element-wise checks first so tan() only runs on the survivors
     mask = (
-        (theta_rad >= math.radians(min_angle_deg))
-        & (tan_theta > 0)
+        np.isfinite(theta)
+        & np.isfinite(v)
+        & (np.abs(theta) >= min_angle_deg)
         & (v >= min_speed)
     )
+    theta = theta[mask]
+    v = v[mask]
+
+    tan_theta = np.tan(np.deg2rad(np.abs(theta)))
+    mask = tan_theta > 0
     theta_f = theta[mask]
     v_f = v[mask]
     tan_f = tan_theta[mask]
@@ -100,22 +149,43 @@ def _filter_data(
 
 def _compute_metrics(v_true: np.ndarray, v_pred: np.ndarray) -> dict:
     err = v_pred - v_true
-    mae = float(np.mean(np.abs(err)))
-    rmse = float(np.sqrt(np.mean(err ** 2)))
+    abs_err = np.abs(err)
+    mae = float(np.mean(abs_err))
+    # dot() squares and sums in one pass without an err**2 temporary
+    rmse = math.sqrt(float(np.dot(err, err)) / err.size)
     with np.errstate(divide="ignore", invalid="ignore"):
-        mape = np.abs(err) / np.maximum(np.abs(v_true), 1e-9)
-        mape = float(np.mean(mape) * 100.0)
+        abs_err /= np.maximum(np.abs(v_true), 1e-9)
+        mape = float(np.mean(abs_err) * 100.0)
     return {"mae": mae, "rmse": rmse, "mape_pct": mape}
 
 
+def _single_moments(s: np.ndarray, v: np.ndarray) -> Tuple[float, float]:
+    """Return (s.v, s.s) in one pass over both arrays."""
+    num = 0.0
+    den = 0.0
+    for i in range(s.size):
+        si = s[i]
+        num += si * v[i]
+        den += si * si
+    return num, den
+
+
+# Inputs are already filtered to finite values, so fastmath is safe here
+if numba is not None:
+    _single_moments = numba.njit(fastmath=True, cache=True)(_single_moments)
+
+
 def fit_single_parameter(
     theta_deg: np.ndarray, v_gt: np.ndarray, min_speed: float, min_angle_deg: float
 ) -> Tuple[float, dict]:
     """Fit single-parameter model V = C * sqrt(tan(|theta|))."""
     _, v_f, tan_f, sqrt_tan_f = _filter_data(theta_deg, v_gt, min_speed, min_angle_deg)
 
-    num = float(np.dot(sqrt_tan_f, v_f))
-    den = float(np.dot(sqrt_tan_f, sqrt_tan_f))
+    if numba is not None:
+        num, den = _single_moments(sqrt_tan_f, v_f)
+    else:
+        num = float(np.dot(sqrt_tan_f, v_f))
+        den = float(np.dot(sqrt_tan_f, sqrt_tan_f))
     if den <= 0:
         raise RuntimeError("Degenerate data: denominator for C is non-positive.")
     C = num / den
@@ -141,11 +211,18 @@ def fit_two_parameter(
     z = np.log(tan_pos)
     w = np.log(v_pos)
 
-    # Linear regression: w = a + p * z
-    X = np.vstack([np.ones_like(z), z]).T
-    beta, *_ = np.linalg.lstsq(X, w, rcond=None)
-    a = float(beta[0])
-    p = float(beta[1])
+    # Linear regression: w = a + p * z, in closed form on centred data
+    # (raw moments cancel badly when z barely varies about its mean)
+    n = z.size
+    z_mean = float(z.mean())
+    w_mean = float(w.mean())
+    zc = z - z_mean
+    szz = float(np.dot(zc, zc))
+    # Degenerate when the spread of z is down at the rounding noise of z
+    if szz <= (64 * np.finfo(float).eps) ** 2 * (szz + n * z_mean * z_mean):
+        raise RuntimeError("Degenerate data: all samples have the same angle.")
+    p = float(np.dot(zc, w - w_mean)) / szz
+    a = w_mean - p * z_mean
     A = float(math.exp(a))
 
     v_pred = A * (tan_pos ** p)
@@ -153,55 +230,27 @@ def fit_two_parameter(
     return (A, p), metrics
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(
-        description=(
-            "Fit calibration models relating pendulum angle (student) "
-            "to ground-truth wind speed using saved CSV logs."
-        )
-    )
-    parser.add_argument("log", type=Path, help="Path to aligned CSV log from Testing_mac.py")
-    parser.add_argument(
-        "--min-speed",
-        type=float,
-        default=0.5,
-        help="Minimum ground-truth speed (m/s) to include in fit (default: 0.5)",
-    )
-    parser.add_argument(
-        "--min-angle-deg",
-        type=float,
-        default=0.2,
-        help="Minimum absolute angle in degrees to include in fit (default: 0.2)",
-    )
-    parser.add_argument(
-        "--models",
-        choices=["single", "double", "both"],
-        default="both",
-        help="Which models to fit (default: both)",
-    )
-
-    args = parser.parse_args()
-
-    csv_path: Path = args.log
-    if not csv_path.exists():
-        raise SystemExit(f"CSV log not found: {csv_path}")
+def fit_log(csv_path: Path, models: str, min_speed: float, min_angle_deg: float):
+    """Load one log, fit the requested models and print a summary.
 
+    Returns the JSON payload, or None if no model could be fitted.
+    """
     print(f"Loading data from: {csv_path}")
     theta_deg, v_gt = load_aligned_log(csv_path)
     print(f"Loaded {theta_deg.size} samples (student angle deg, ground_truth_mps)")
 
     results = {}
 
-    if args.models in ("single", "both"):
+    if models in ("single", "both"):
         print("\nFitting single-parameter model: V = C * sqrt(tan(|theta|))")
         try:
-            C, metrics = fit_single_parameter(theta_deg, v_gt, args.min_speed, args.min_angle_deg)
+            C, metrics = fit_single_parameter(theta_deg, v_gt, min_speed, min_angle_deg)
             results["single"] = {
                 "C": C,
                 "metrics": metrics,
                 "model": "V = C * sqrt(tan(|theta|))",
-                "min_speed": args.min_speed,
-                "min_angle_deg": args.min_angle_deg,
+                "min_speed": min_speed,
+                "min_angle_deg": min_angle_deg,
             }
             print(f"  C = {C:.6f}")
             print(
@@ -212,17 +261,17 @@ def main() -> None:
         except RuntimeError as e:
             print(f"  Single-parameter fit failed: {e}")
 
-    if args.models in ("double", "both"):
+    if models in ("double", "both"):
         print("\nFitting two-parameter model: V = A * (tan(|theta|))**p")
         try:
-            (A, p), metrics = fit_two_parameter(theta_deg, v_gt, args.min_speed, args.min_angle_deg)
+            (A, p), metrics = fit_two_parameter(theta_deg, v_gt, min_speed, min_angle_deg)
             results["double"] = {
                 "A": A,
                 "p": p,
                 "metrics": metrics,
                 "model": "V = A * (tan(|theta|))**p",
-                "min_speed": args.min_speed,
-                "min_angle_deg": args.min_angle_deg,
+                "min_speed": min_speed,
+                "min_angle_deg": min_angle_deg,
             }
             print(f"  A = {A:.6f}, p = {p:.4f}")
             print(
@@ -234,7 +283,7 @@ def main() -> None:
             print(f"  Two-parameter fit failed: {e}")
 
     if not results:
-        raise SystemExit("No successful fits. See messages above for details.")
+        return None
 
     # Decide a recommended model based on RMSE (lower is better)
     best_name = None
@@ -250,16 +299,112 @@ def main() -> None:
     # Prepare JSON payload. Keep backward-compatible 'calibration_constant'
     # for the single-parameter model so pi_pendulum_angle.py can continue to
     # use it directly, while also storing full details for both models.
-    payload = {
+    return {
         "calibration_constant": results.get("single", {}).get("C", 1.0),
         "models": results,
         "recommended_model": best_name,
     }
 
-    out_path = Path("pendulum_calibration.json")
-    with out_path.open("w") as f:
-        json.dump(payload, f, indent=2, sort_keys=True)
-    print(f"\nSaved calibration to {out_path.resolve()}")
+
+def _fit_log_quiet(csv_path: Path, models: str, min_speed: float, min_angle_deg: float):
+    """fit_log for worker processes: returns (printed text, payload or error)."""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        try:
+            payload = fit_log(csv_path, models, min_speed, min_angle_deg)
+        except RuntimeError as e:
+            payload = e
+    return out.getvalue(), payload
+
+
+def save_payload(out_path: Path, payload: dict) -> None:
+    if orjson is not None:
+        out_path.write_bytes(
+            orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS, default=float)
+        )
+    else:
+        with out_path.open("w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Fit calibration models relating pendulum angle (student) "
+            "to ground-truth wind speed using saved CSV logs."
+        )
+    )
+    parser.add_argument(
+        "log",
+        type=Path,
+        nargs="+",
+        help=(
+            "Path to aligned CSV log from Testing_mac.py. With several logs, "
+            "each is fitted separately (in parallel) and saved next to it as <log>.json"
+        ),
+    )
+    parser.add_argument(
+        "--min-speed",
+        type=float,
+        default=0.5,
+        help="Minimum ground-truth speed (m/s) to include in fit (default: 0.5)",
+    )
+    parser.add_argument(
+        "--min-angle-deg",
+        type=float,
+        default=0.2,
+        help="Minimum absolute angle in degrees to include in fit (default: 0.2)",
+    )
+    parser.add_argument(
+        "--models",
+        choices=["single", "double", "both"],
+        default="both",
+        help="Which models to fit (default: both)",
+    )
+
+    args = parser.parse_args()
+
+    for csv_path in args.log:
+        if not csv_path.exists():
+            raise SystemExit(f"CSV log not found: {csv_path}")
+
+    if len(args.log) == 1:
+        payload = fit_log(args.log[0], args.models, args.min_speed, args.min_angle_deg)
+        if payload is None:
+            raise SystemExit("No successful fits. See messages above for details.")
+
+        out_path = Path("pendulum_calibration.json")
+        save_payload(out_path, payload)
+        print(f"\nSaved calibration to {out_path.resolve()}")
+        return
+
+    # Several logs: one worker process per log
+    n = len(args.log)
+    failed = 0
+    with ProcessPoolExecutor() as ex:
+        jobs = ex.map(
+            _fit_log_quiet,
+            args.log,
+            [args.models] * n,
+            [args.min_speed] * n,
+            [args.min_angle_deg] * n,
+        )
+        for csv_path, (text, payload) in zip(args.log, jobs):
+            print(text, end="")
+            if isinstance(payload, Exception):
+                print(f"Failed to load {csv_path}: {payload}")
+                failed += 1
+            elif payload is None:
+                print(f"No successful fits for {csv_path}.")
+                failed += 1
+            else:
+                out_path = csv_path.with_suffix(".json")
+                save_payload(out_path, payload)
+                print(f"Saved calibration to {out_path.resolve()}")
+            print()
+
+    if failed:
+        raise SystemExit(f"{failed} of {n} logs could not be fitted.")
 
 
 if __name__ == "__main__":
@@ -1,37 +1,451 @@
+import argparse
 import cv2
+import math
 import numpy as np
+import queue
+import sys
+import threading
 import time
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# OpenCV's fixed-point tables for 8-bit BGR -> HSV (hue 0-179), so the fused
+# kernel below gives exactly the same mask as cvtColor + inRange
+_HSV_SHIFT = 12
+_HSV_HALF = 1 << (_HSV_SHIFT - 1)
+_SDIV = np.zeros(256, np.int32)
+_SDIV[1:] = np.rint((255 << _HSV_SHIFT) / np.arange(1, 256))
+_HDIV = np.zeros(256, np.int32)
+_HDIV[1:] = np.rint((180 << _HSV_SHIFT) / (6.0 * np.arange(1, 256)))
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def bgr_in_hsv_range(bgr, lo, hi, out):
+        """cv2.inRange(cv2.cvtColor(bgr, BGR2HSV), lo, hi, out) in one pass."""
+        lo_h, lo_s, lo_v = np.int64(lo[0]), np.int64(lo[1]), np.int64(lo[2])
+        hi_h, hi_s, hi_v = np.int64(hi[0]), np.int64(hi[1]), np.int64(hi[2])
+        for y in numba.prange(out.shape[0]):
+            for x in range(out.shape[1]):
+                b = np.int64(bgr[y, x, 0])
+                g = np.int64(bgr[y, x, 1])
+                r = np.int64(bgr[y, x, 2])
+                out[y, x] = 0
+                # Cheapest test first: V is just the largest channel, and
+                # most background pixels already fail it or S
+                v = max(b, g, r)
+                if v < lo_v or v > hi_v:
+                    continue
+                d = v - min(b, g, r)
+                s = (d * _SDIV[v] + _HSV_HALF) >> _HSV_SHIFT
+                if s < lo_s or s > hi_s:
+                    continue
+                if v == r:
+                    h = g - b
+                elif v == g:
+                    h = b - r + 2 * d
+                else:
+                    h = r - g + 4 * d
+                h = (h * _HDIV[d] + _HSV_HALF) >> _HSV_SHIFT
+                if h < 0:
+                    h += 180
+                if lo_h <= h <= hi_h:
+                    out[y, x] = 255
+
+    @numba.njit(cache=True)
+    def two_means_centroids(mask, ax, ay, bx, by, iterations):
+        """Split the mask's foreground into two clusters seeded at a and b.
+
+        Returns (ax, ay, bx, by, n_a, n_b): cluster centroids and pixel counts.
+        """
+        n = 0
+        for y in range(mask.shape[0]):
+            for x in range(mask.shape[1]):
+                if mask[y, x]:
+                    n += 1
+        xs = np.empty(n, np.float64)
+        ys = np.empty(n, np.float64)
+        i = 0
+        for y in range(mask.shape[0]):
+            for x in range(mask.shape[1]):
+                if mask[y, x]:
+                    xs[i] = x
+                    ys[i] = y
+                    i += 1
+
+        n_a = n_b = 0
+        for _ in range(iterations):
+            sax = say = sbx = sby = 0.0
+            n_a = n_b = 0
+            for i in range(n):
+                x, y = xs[i], ys[i]
+                if (x - ax)**2 + (y - ay)**2 <= (x - bx)**2 + (y - by)**2:
+                    sax += x
+                    say += y
+                    n_a += 1
+                else:
+                    sbx += x
+                    sby += y
+                    n_b += 1
+            if n_a == 0 or n_b == 0:
+                break
+            ax, ay = sax / n_a, say / n_a
+            bx, by = sbx / n_b, sby / n_b
+        return ax, ay, bx, by, n_a, n_b
+else:
+    bgr_in_hsv_range = None
+    two_means_centroids = None
+
+# GPU segmentation needs an OpenCV build with the CUDA modules
+try:
+    HAS_CUDA = cv2.cuda.getCudaEnabledDeviceCount() > 0
+except (AttributeError, cv2.error):
+    HAS_CUDA = False
+
 class PendulumAngleEstimator:
-    def __init__(self, camera_index=0):
+    def __init__(self, camera_index=0, debug=False):
         self.cap = cv2.VideoCapture(camera_index)
         if not self.cap.isOpened():
             raise ValueError("Could not open webcam.")
+        # Keep only the newest frame in the driver so reads aren't stale
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             
         # Default Range (Green-ish)
-        self.lower_color = np.array([35, 50, 50])
-        self.upper_color = np.array([85, 255, 255])
+        # uint8 to match the HSV image; updated in place on click
+        self.lower_color = np.array([35, 50, 50], dtype=np.uint8)
+        self.upper_color = np.array([85, 255, 255], dtype=np.uint8)
+        self._update_hue_lut()
         
+        # Detection runs on a downscaled copy of each frame; blob areas and
+        # centroids are converted back to full-frame pixels
+        self.scale = 0.5
+
+        # After a detection, only search a box around the two pins
+        # (x0, y0, x1, y1 in full-frame pixels); None means the whole frame
+        self.roi = None
+        self.roi_pad = 40
+        self.last_points = None
+
+        # Reused every frame instead of being reallocated
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._mask = None
+        self._color_mask = None # Chosen on the first frame, see _pick_color_mask
+        self.debug = debug # Overlay a thumbnail of the mask
+        self._mask_slot = np.zeros((120, 160), np.uint8)
+        self._mask_bgr = np.zeros((120, 160, 3), np.uint8)
+        self._debug_frame_ctr = 0
+        self.debug_every = 6 # Refresh the thumbnail on every 6th frame
+        if HAS_CUDA:
+            self._gpu_frame = cv2.cuda_GpuMat()
+            self._gpu_open = cv2.cuda.createMorphologyFilter(cv2.MORPH_OPEN, cv2.CV_8UC1, self.kernel)
+            self._gpu_dilate = cv2.cuda.createMorphologyFilter(cv2.MORPH_DILATE, cv2.CV_8UC1, self.kernel)
+        if bgr_in_hsv_range is not None:
+            # First launch of a parallel kernel must happen on the main
+            # thread; from the detector thread numba's threading layer can
+            # hang the process on exit. Also compiles (or loads from cache)
+            # before the first real frame.
+            bgr_in_hsv_range(np.zeros((8, 8, 3), np.uint8), self.lower_color, self.upper_color,
+                             np.empty((8, 8), np.uint8))
+
         self.prev_theta = 0.0
         self.alpha = 0.2 
         
         cv2.namedWindow("Pendulum Tracker")
         cv2.setMouseCallback("Pendulum Tracker", self.mouse_callback)
-        self.current_frame = None
+        self._pick = None # Pending click (x, y), handled by the detector
+
+        # Capture -> detect -> display pipeline. Small queues keep latency
+        # low: when a stage falls behind, the oldest frame is dropped.
+        self.q_raw = queue.Queue(maxsize=2)
+        self.q_disp = queue.Queue(maxsize=2)
+        self.stop_event = threading.Event()
+        self._worker_error = None # Raised again by run() once cleaned up
+
+        # Angle lines go through a logger thread so a slow terminal (e.g.
+        # over SSH) can't stall the detector
+        self._log_q = queue.Queue(maxsize=256)
+        self.log_interval = 0.1  # Seconds between writes (~10 Hz)
 
     def mouse_callback(self, event, x, y, flags, param):
         """Left Click: Pick the color of BOTH pins at once"""
         if event == cv2.EVENT_LBUTTONDOWN:
-            if self.current_frame is None: return
-            
-            hsv = cv2.cvtColor(self.current_frame, cv2.COLOR_BGR2HSV)
-            pixel = hsv[y, x]
-            h, s, v = pixel
-            
-            # Wide range to catch both pins
-            self.lower_color = np.array([max(0, h-20), max(30, s-60), max(30, v-60)])
-            self.upper_color = np.array([min(179, h+20), min(255, s+60), min(255, v+60)])
-            print(f"Color set to: {pixel}")
+            # Overlays are drawn straight onto the frames, so the colour is
+            # sampled by the detector from the next clean frame instead
+            self._pick = (x, y)
+
+    def _pick_color(self, frame, x, y):
+        hsv = cv2.cvtColor(frame[y:y+1, x:x+1], cv2.COLOR_BGR2HSV)
+        pixel = hsv[0, 0]
+        h, s, v = (int(c) for c in pixel) # Python ints so h-20 can't wrap around
+        
+        # Wide range to catch both pins
+        self.lower_color[:] = (max(0, h-20), max(30, s-60), max(30, v-60))
+        self.upper_color[:] = (min(179, h+20), min(255, s+60), min(255, v+60))
+        self._update_hue_lut()
+        print(f"Color set to: {pixel}")
+
+    @staticmethod
+    def _put_latest(q, item):
+        """Put item on q, dropping the oldest entry if q is full."""
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _log(self, text):
+        """Queue a line for the logger thread; drops it rather than block."""
+        try:
+            self._log_q.put_nowait(text)
+        except queue.Full:
+            pass
+
+    def _log_loop(self):
+        """Write queued lines to stdout, batching whatever has piled up."""
+        while True:
+            lines = [self._log_q.get()]
+            while not self._log_q.empty():
+                lines.append(self._log_q.get_nowait())
+            # Sentinel from run() on shutdown; a late line from a worker
+            # that outlived its join can land after it, so look at them all
+            done = None in lines
+            if done:
+                lines = [line for line in lines if line is not None]
+            if lines:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+            if done:
+                return
+            # Let lines pile up for a while: one write per batch, not per frame
+            time.sleep(self.log_interval)
+
+    def _capture_loop(self):
+        while not self.stop_event.is_set():
+            if not self.cap.grab(): break
+            # Only decode when the detector is ready for a new frame
+            if not self.q_raw.empty(): continue
+            ret, frame = self.cap.retrieve()
+            if not ret: break
+            self._put_latest(self.q_raw, frame)
+        self._put_latest(self.q_raw, None) # Tell the detector we're done
+
+    def _detect_loop(self):
+        try:
+            while True:
+                frame = self.q_raw.get()
+                if frame is None: break
+                self._put_latest(self.q_disp, self.process_frame(frame))
+        except Exception as e:
+            # Don't leave run() waiting on a dead thread: stop capture too
+            self._worker_error = e
+            self.stop_event.set()
+        finally:
+            self._put_latest(self.q_disp, None) # Tell the display we're done
+
+    def process_frame(self, frame):
+        """Find the two pins in frame, update the angle and draw the overlay.
+
+        The overlay is drawn onto frame itself, which is also returned.
+        """
+        pick, self._pick = self._pick, None
+        if pick is not None:
+            self._pick_color(frame, *pick)
+
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            search = frame[y0:y1, x0:x1]
+        else:
+            x0 = y0 = 0
+            search = frame
+        small = cv2.resize(search, (0, 0), fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if self._mask is None or self._mask.shape != small.shape[:2]:
+            self._mask = np.empty(small.shape[:2], np.uint8)
+        mask = self._mask
+        if self._color_mask is None:
+            self._color_mask = self._pick_color_mask(small, mask)
+        self._color_mask(small, mask) # Colour test + noise clean-up
+
+        blobs = self._find_two_blobs(mask, x0, y0)
+
+        points = []
+        if len(blobs) == 2:
+            # We found at least 2 objects!
+            for cx, cy in blobs:
+                points.append((int(cx / self.scale) + x0, int(cy / self.scale) + y0))
+
+            if len(points) == 2:
+                # Sort by Y coordinate (Height)
+                # Smallest Y is at the top (Pivot), Largest Y is at the bottom (Bob)
+                points.sort(key=lambda p: p[1])
+
+                top_pt = points[0] # Pivot
+                bot_pt = points[1] # Bob
+                self._update_roi(top_pt, bot_pt, frame.shape)
+
+                # Draw
+                cv2.circle(frame, top_pt, 8, (255, 0, 0), -1) # Blue = Top
+                cv2.circle(frame, bot_pt, 8, (0, 0, 255), -1) # Red = Bottom
+                cv2.line(frame, top_pt, bot_pt, (0, 255, 0), 2)
+
+                # Calculate Angle
+                dx = bot_pt[0] - top_pt[0]
+                dy = bot_pt[1] - top_pt[1]
+
+                # Plain floats: math is much cheaper than NumPy ufuncs on scalars
+                theta_deg = math.degrees(math.atan2(dx, dy))
+
+                # Smooth
+                self.prev_theta += self.alpha * (theta_deg - self.prev_theta)
+                theta_smooth = self.prev_theta
+
+                # Output
+                text = f"Angle: {theta_smooth:.2f}"
+                self._log(text) # Print to terminal
+                cv2.putText(frame, text, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+
+        if len(points) != 2:
+            # Lost lock: search the whole frame next time
+            self.roi = None
+            self.last_points = None
+
+        if self.debug:
+            # Show mask for debugging. The thumbnail is only refreshed every
+            # few frames; in between the last one is pasted again
+            if self._debug_frame_ctr % self.debug_every == 0:
+                cv2.resize(mask, (160, 120), dst=self._mask_slot, interpolation=cv2.INTER_NEAREST)
+                cv2.cvtColor(self._mask_slot, cv2.COLOR_GRAY2BGR, dst=self._mask_bgr)
+            self._debug_frame_ctr += 1
+            # A plain copy of the ready-made BGR thumbnail; numpy's
+            # broadcasting assign from one channel is far slower
+            frame[0:120, 0:160] = self._mask_bgr
+        return frame
+
+    def _find_two_blobs(self, mask, x0, y0):
+        """Centroids (in mask pixels) of the pivot and bob, or [] if not found."""
+        min_area = 50 * self.scale**2 # Ignore tiny noise
+
+        # Inside the ROI we know roughly where both pins are: two-means
+        # seeded at the last detection avoids labelling the whole mask
+        if two_means_centroids is not None and self.roi is not None and self.last_points is not None:
+            (tx, ty), (bx, by) = self.last_points
+            s = self.scale
+            ax, ay, bx, by, n_a, n_b = two_means_centroids(
+                mask, (tx - x0) * s, (ty - y0) * s, (bx - x0) * s, (by - y0) * s, 3)
+            if min(n_a, n_b) >= min_area:
+                return [(ax, ay), (bx, by)]
+
+        # Label the blobs; areas and centroids come out of the same pass
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        areas = stats[1:, cv2.CC_STAT_AREA] # Label 0 is the background
+        if areas.size < 2:
+            return []
+        # Keep the two largest
+        top2 = np.argpartition(-areas, 1)[:2]
+        if areas[top2].min() < min_area:
+            return []
+        return [tuple(centroids[i + 1]) for i in top2]
+
+    def _clean_mask(self, mask):
+        # Clean noise: open (erode + dilate) then one more dilate
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=mask)
+        cv2.dilate(mask, self.kernel, dst=mask, iterations=1)
+
+    def _mask_opencv(self, bgr, mask):
+        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+        cv2.inRange(hsv, self.lower_color, self.upper_color, dst=mask)
+        self._clean_mask(mask)
+
+    def _update_hue_lut(self):
+        """Rebuild the hue lookup table; call whenever the bounds change."""
+        lut = np.zeros(256, np.uint8)
+        lut[int(self.lower_color[0]):int(self.upper_color[0]) + 1] = 255
+        self.h_lut = lut # Replace rather than edit: the detector may be using it
+
+    def _mask_hue_lut(self, bgr, mask):
+        # Hue test as a 256-entry table lookup, S and V as single-channel ranges
+        h, s, v = cv2.split(cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV))
+        lo, hi = self.lower_color, self.upper_color
+        cv2.LUT(h, self.h_lut, dst=mask)
+        cv2.bitwise_and(mask, cv2.inRange(s, int(lo[1]), int(hi[1])), dst=mask)
+        cv2.bitwise_and(mask, cv2.inRange(v, int(lo[2]), int(hi[2])), dst=mask)
+        self._clean_mask(mask)
+
+    def _mask_fused(self, bgr, mask):
+        # One pass over the pixels, no intermediate HSV image
+        bgr_in_hsv_range(bgr, self.lower_color, self.upper_color, mask)
+        self._clean_mask(mask)
+
+    def _mask_cuda(self, bgr, mask):
+        # Whole segmentation on the GPU; only the final mask comes back
+        self._gpu_frame.upload(bgr)
+        hsv = cv2.cuda.cvtColor(self._gpu_frame, cv2.COLOR_BGR2HSV)
+        lo = tuple(int(c) for c in self.lower_color)
+        hi = tuple(int(c) for c in self.upper_color)
+        gpu_mask = cv2.cuda.inRange(hsv, lo, hi)
+        gpu_mask = self._gpu_dilate.apply(self._gpu_open.apply(gpu_mask))
+        gpu_mask.download(mask)
+
+    def _mask_umat(self, bgr, mask):
+        # Transparent API: OpenCV runs these on an OpenCL device
+        hsv = cv2.cvtColor(cv2.UMat(bgr), cv2.COLOR_BGR2HSV)
+        umask = cv2.inRange(hsv, self.lower_color, self.upper_color)
+        umask = cv2.morphologyEx(umask, cv2.MORPH_OPEN, self.kernel)
+        umask = cv2.dilate(umask, self.kernel)
+        mask[...] = umask.get()
+
+    def _pick_color_mask(self, bgr, mask, repeats=5):
+        """Return whichever mask method is fastest on this machine.
+
+        Each method does the colour test and noise clean-up and gives the
+        same mask. Which is faster depends on the OpenCV build, the GPU, the
+        core count and how much of the scene the numba kernel's V/S early
+        exit rejects.
+        """
+        methods = {"OpenCV inRange": self._mask_opencv, "hue LUT": self._mask_hue_lut}
+        if bgr_in_hsv_range is not None:
+            self._mask_fused(bgr, mask) # Compile (or load from cache) first
+            methods["numba"] = self._mask_fused
+        if HAS_CUDA:
+            self._mask_cuda(bgr, mask) # Warm up the CUDA context
+            methods["CUDA"] = self._mask_cuda
+        if cv2.ocl.haveOpenCL():
+            self._mask_umat(bgr, mask) # Build the OpenCL kernels
+            methods["OpenCL"] = self._mask_umat
+        timings = {}
+        for name, method in methods.items():
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                method(bgr, mask)
+            timings[name] = time.perf_counter() - t0
+        best = min(timings, key=timings.get)
+        print(f"Colour mask: {best}")
+        return methods[best]
+
+    def _update_roi(self, top_pt, bot_pt, shape):
+        """Set the search box for the next frame around the pivot and bob."""
+        if self.last_points is not None:
+            jump = max(abs(a - b) for p, q in zip((top_pt, bot_pt), self.last_points) for a, b in zip(p, q))
+            if jump > self.roi_pad:
+                # Moved further than the box allows for: don't trust the box
+                self.roi = None
+                self.last_points = (top_pt, bot_pt)
+                return
+        self.last_points = (top_pt, bot_pt)
+
+        dist = np.hypot(bot_pt[0] - top_pt[0], bot_pt[1] - top_pt[1])
+        pad = max(self.roi_pad, int(0.25 * dist))
+        h, w = shape[:2]
+        x0 = max(0, min(top_pt[0], bot_pt[0]) - pad)
+        y0 = max(0, min(top_pt[1], bot_pt[1]) - pad)
+        x1 = min(w, max(top_pt[0], bot_pt[0]) + pad)
+        y1 = min(h, max(top_pt[1], bot_pt[1]) + pad)
+        self.roi = (x0, y0, x1, y1)
 
     def run(self):
         print("--- PENDULUM ANGLE TRACKER (SAME COLOR MODE) ---")
@@ -39,78 +453,44 @@ class PendulumAngleEstimator:
         print("2. The script will find the TWO largest green blobs.")
         print("3. Top blob = Pivot, Bottom blob = Bob.")
         
+        cap_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        det_thread = threading.Thread(target=self._detect_loop, daemon=True)
+        log_thread = threading.Thread(target=self._log_loop, daemon=True)
+        log_thread.start()
+        cap_thread.start()
+        det_thread.start()
+
+        # GUI calls stay on the main thread
         while True:
-            ret, frame = self.cap.read()
-            if not ret: break
-            self.current_frame = frame
-            
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            mask = cv2.inRange(hsv, self.lower_color, self.upper_color)
-            
-            # Clean noise
-            kernel = np.ones((3,3), np.uint8)
-            mask = cv2.erode(mask, kernel, iterations=1)
-            mask = cv2.dilate(mask, kernel, iterations=2)
-            
-            # Find ALL contours
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Sort by area (largest first) and keep top 2
-            blobs = sorted(contours, key=cv2.contourArea, reverse=True)[:2]
-            
-            display = frame.copy()
-            
-            points = []
-            if len(blobs) >= 2:
-                # We found at least 2 objects!
-                for c in blobs:
-                    if cv2.contourArea(c) < 50: continue # Ignore tiny noise
-                    
-                    M = cv2.moments(c)
-                    if M["m00"] != 0:
-                        cx = int(M["m10"] / M["m00"])
-                        cy = int(M["m01"] / M["m00"])
-                        points.append((cx, cy))
-                
-                if len(points) == 2:
-                    # Sort by Y coordinate (Height)
-                    # Smallest Y is at the top (Pivot), Largest Y is at the bottom (Bob)
-                    points.sort(key=lambda p: p[1]) 
-                    
-                    top_pt = points[0] # Pivot
-                    bot_pt = points[1] # Bob
-                    
-                    # Draw
-                    cv2.circle(display, top_pt, 8, (255, 0, 0), -1) # Blue = Top
-                    cv2.circle(display, bot_pt, 8, (0, 0, 255), -1) # Red = Bottom
-                    cv2.line(display, top_pt, bot_pt, (0, 255, 0), 2)
-                    
-                    # Calculate Angle
-                    dx = bot_pt[0] - top_pt[0]
-                    dy = bot_pt[1] - top_pt[1]
-                    
-                    theta_rad = np.arctan2(dx, dy)
-                    theta_deg = np.degrees(theta_rad)
-                    
-                    # Smooth
-                    theta_smooth = (self.alpha * theta_deg) + ((1 - self.alpha) * self.prev_theta)
-                    self.prev_theta = theta_smooth
-                    
-                    # Output
-                    text = f"Angle: {theta_smooth:.2f}"
-                    print(text) # Print to terminal
-                    cv2.putText(display, text, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-            
-            # Show mask for debugging
-            mask_small = cv2.resize(mask, (160, 120))
-            display[0:120, 0:160] = cv2.cvtColor(mask_small, cv2.COLOR_GRAY2BGR)
+            try:
+                display = self.q_disp.get(timeout=0.05)
+            except queue.Empty:
+                # Keep the window responsive while waiting for a frame
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+            if display is None: break
             
             cv2.imshow("Pendulum Tracker", display)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
                 
+        self.stop_event.set()
+        cap_thread.join(timeout=1.0)
+        det_thread.join(timeout=1.0)
+        self._log_q.put(None) # Flush what's left and stop the logger
+        log_thread.join(timeout=1.0)
         self.cap.release()
         cv2.destroyAllWindows()
+        if self._worker_error is not None:
+            raise self._worker_error
 
 if __name__ == "__main__":
-    PendulumAngleEstimator().run()
+    parser = argparse.ArgumentParser(description='Pendulum Angle Tracker')
+    parser.add_argument('--camera', type=int, default=0,
+                        help='Camera index for cv2.VideoCapture (default: 0)')
+    parser.add_argument('--debug', action='store_true',
+                        help='Show a thumbnail of the colour mask in the corner of the preview')
+    args = parser.parse_args()
+
+    PendulumAngleEstimator(camera_index=args.camera, debug=args.debug).run()
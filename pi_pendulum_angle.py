@@ -5,17 +5,155 @@ import argparse
 import math
 import serial
 import json
+import os
+import queue
+import signal
+import sys
+import threading
 from pathlib import Path
 
 # --- RASPBERRY PI CAMERA SETUP ---
 try:
-    from picamera2 import Picamera2
+    from picamera2 import Picamera2, MappedArray
     HAS_PI_CAMERA = True
 except ImportError:
     print("Warning: picamera2 not found. This script is intended for Raspberry Pi.")
     print("Falling back to cv2.VideoCapture(0) for testing on PC...")
     HAS_PI_CAMERA = False
 
+# --- OPTIONAL GPU SEGMENTATION ---
+# Needs an OpenCV build with the CUDA modules (not the case on the Pi)
+try:
+    HAS_CUDA = cv2.cuda.getCudaEnabledDeviceCount() > 0
+except (AttributeError, cv2.error):
+    HAS_CUDA = False
+
+# --- OPTIONAL NUMBA KERNEL ---
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# OpenCV's fixed-point tables for 8-bit BGR -> HSV (hue 0-179), so the
+# kernel's in-place conversion matches cvtColor exactly
+_HSV_SHIFT = 12
+_HSV_HALF = 1 << (_HSV_SHIFT - 1)
+_SDIV = np.zeros(256, np.int32)
+_SDIV[1:] = np.rint((255 << _HSV_SHIFT) / np.arange(1, 256))
+_HDIV = np.zeros(256, np.int32)
+_HDIV[1:] = np.rint((180 << _HSV_SHIFT) / (6.0 * np.arange(1, 256)))
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def mask_and_morph(img, lo, hi, iters_e, iters_d, out):
+        """
+        cv2.cvtColor to HSV, cv2.inRange, then erode/dilate with a 3x3
+        square, in one call.
+
+        Each BGR pixel is converted and range-tested while it is read, so
+        no HSV image is ever written out. The range test packs 64 pixels
+        into each uint64 word; the morphology
+        then shifts and ANDs (erode) or ORs (dilate) whole words with their
+        neighbours instead of touching every pixel. Pixels outside the image
+        never change the result, as with OpenCV's default border.
+
+        Args:
+            img: (H, W, C) image; C is 3 (BGR) or 1 (Y plane)
+            lo, hi: inclusive bounds, HSV for a BGR image, length C
+            iters_e, iters_d: erode and dilate iterations
+            out: (H, W) uint8 mask, overwritten with 0/255
+
+        Returns:
+            out
+        """
+        h, w = out.shape
+        nc = img.shape[2]
+        nw = (w + 63) // 64
+        zero = np.uint64(0)
+        ones = ~zero
+        one = np.uint64(1)
+        top = np.uint64(63)
+        tail = w - 64 * (nw - 1)  # Valid bits in each row's last word
+        last_valid = ones if tail == 64 else (one << np.uint64(tail)) - one
+
+        # Range test, one row at a time, then pack the row into words
+        bits = np.empty((h, nw), np.uint64)
+        tmp = np.empty((h, nw), np.uint64)
+        for y in numba.prange(h):
+            row = np.zeros(64 * nw, np.uint8)
+            if nc == 3:
+                lo_h, lo_s, lo_v = np.int32(lo[0]), np.int32(lo[1]), np.int32(lo[2])
+                hi_h, hi_s, hi_v = np.int32(hi[0]), np.int32(hi[1]), np.int32(hi[2])
+                for x in range(w):
+                    b = np.int32(img[y, x, 0])
+                    g = np.int32(img[y, x, 1])
+                    r = np.int32(img[y, x, 2])
+                    # V and S first: most background pixels fail one of them
+                    v = max(b, g, r)
+                    if v < lo_v or v > hi_v:
+                        continue
+                    d = v - min(b, g, r)
+                    s = (d * _SDIV[v] + _HSV_HALF) >> _HSV_SHIFT
+                    if s < lo_s or s > hi_s:
+                        continue
+                    if v == r:
+                        hue = g - b
+                    elif v == g:
+                        hue = b - r + 2 * d
+                    else:
+                        hue = r - g + 4 * d
+                    hue = (hue * _HDIV[d] + _HSV_HALF) >> _HSV_SHIFT
+                    if hue < 0:
+                        hue += 180
+                    row[x] = (hue >= lo_h) & (hue <= hi_h)
+            else:
+                for x in range(w):
+                    p = img[y, x, 0]
+                    row[x] = (p >= lo[0]) & (p <= hi[0])
+            for k in range(nw):
+                word = zero
+                for j in range(64):
+                    word |= np.uint64(row[64 * k + j]) << np.uint64(j)
+                bits[y, k] = word
+
+        for it in range(iters_e + iters_d):
+            erode = it < iters_e
+            fill = ones if erode else zero  # Pixels beyond the border
+            # Horizontal pass: bit j of left/right holds pixel j-1/j+1
+            for y in numba.prange(h):
+                for k in range(nw):
+                    r = bits[y, k]
+                    if erode and k == nw - 1:
+                        r |= ~last_valid
+                    prev = bits[y, k - 1] if k > 0 else fill
+                    nxt = bits[y, k + 1] if k < nw - 1 else fill
+                    left = (r << one) | (prev >> top)
+                    right = (r >> one) | (nxt << top)
+                    r = (r & left & right) if erode else (r | left | right)
+                    if k == nw - 1:
+                        r &= last_valid
+                    tmp[y, k] = r
+            # Vertical pass
+            for y in numba.prange(h):
+                for k in range(nw):
+                    up = tmp[y - 1, k] if y > 0 else fill
+                    down = tmp[y + 1, k] if y < h - 1 else fill
+                    r = tmp[y, k]
+                    bits[y, k] = (r & up & down) if erode else (r | up | down)
+
+        # Unpack to 0/255
+        for y in numba.prange(h):
+            row = np.empty(64 * nw, np.uint8)
+            for k in range(nw):
+                word = bits[y, k]
+                for j in range(64):
+                    row[64 * k + j] = np.uint8((word >> np.uint64(j)) & one)
+            for x in range(w):
+                out[y, x] = row[x] * np.uint8(255)
+        return out
+else:
+    mask_and_morph = None
+
 # --- CALIBRATION FILE ---
 CALIBRATION_FILE = "pendulum_calibration.json"
 
@@ -80,7 +218,8 @@ def load_calibration(model_choice="auto", fallback_C=1.0):
 
 class PendulumAngleEstimatorPi:
     def __init__(self, output_mode='speed', calibration_constant=1.0, fast_motion=False, 
-                 serial_port=None, serial_baud=115200, model_choice='auto'):
+                 serial_port=None, serial_baud=115200, model_choice='auto', luma=False,
+                 headless=None):
         """
         Initialize the pendulum angle estimator.
         
@@ -91,6 +230,10 @@ class PendulumAngleEstimatorPi:
             serial_port: Serial port for UART output (e.g., '/dev/ttyAMA0'), None to disable
             serial_baud: Serial baud rate (default: 115200)
             model_choice: 'auto', 'single', or 'double' (default: auto)
+            luma: Track on brightness (Y plane of a YUV420 stream) instead of HSV
+                  colour; Pi camera only (default: False)
+            headless: Skip the preview window and all other GUI calls; None means
+                      headless when there is no X11/Wayland display (default: None)
         """
         # Store fast motion mode
         self.fast_motion = fast_motion
@@ -103,6 +246,7 @@ class PendulumAngleEstimatorPi:
         )
         # Preserve single-parameter constant for backward compatibility/output
         self.calibration_constant = float(self.single_params.get("C", calibration_constant))
+        self._update_speed_model()
         
         # Initialize Serial/UART (optional)
         self.serial_port = None
@@ -120,12 +264,38 @@ class PendulumAngleEstimatorPi:
                 print("Continuing without serial output...")
                 self.serial_port = None
         
+        # Luma mode needs the Pi camera's YUV stream; on PC stay with HSV
+        self.luma = luma and HAS_PI_CAMERA
+        if luma and not HAS_PI_CAMERA:
+            print("Luma mode needs picamera2; using HSV colour tracking instead.")
+
         # Initialize Camera
-        if HAS_PI_CAMERA:
+        if HAS_PI_CAMERA and self.luma:
+            self.picam2 = Picamera2()
+            # YUV420 puts the Y (luma) plane first, contiguous, at no
+            # conversion cost; tracking then skips cvtColor(BGR->HSV).
+            # Video config with the denoiser off: the ISP spends less time
+            # per frame and frames arrive sooner. Four buffers: the capture
+            # and detect threads and q_raw hold at most three between them,
+            # which leaves one for the camera to fill.
+            config = self.picam2.create_video_configuration(
+                main={"format": "YUV420", "size": (640, 480)},
+                buffer_count=4,
+                controls={"FrameDurationLimits": (16666, 16666),  # ~60 FPS
+                          "NoiseReductionMode": 0}  # Off
+            )
+            self.picam2.configure(config)
+            self.picam2.start()
+            self.frame_width, self.frame_height = 640, 480
+            print("PiCamera2 started in luma (YUV420) mode at target 60 FPS.")
+        elif HAS_PI_CAMERA:
             self.picam2 = Picamera2()
-            # Configure for 640x480 @ 60fps for better temporal resolution
+            # Configure for 640x480 @ 60fps for better temporal resolution.
+            # Picamera2's "BGR888" arrays are in [R, G, B] byte order, i.e.
+            # exactly what the old "RGB888" + cvtColor(RGB2BGR) produced, so
+            # the tuned HSV defaults still apply without a per-frame swap.
             config = self.picam2.create_preview_configuration(
-                main={"format": "RGB888", "size": (640, 480)},
+                main={"format": "BGR888", "size": (640, 480)},
                 controls={"FrameDurationLimits": (16666, 16666)}  # ~60 FPS
             )
             self.picam2.configure(config)
@@ -134,12 +304,19 @@ class PendulumAngleEstimatorPi:
                 self.picam2.set_controls({"FrameDurationLimits": (16666, 16666)})
             except Exception as e:
                 print(f"Warning: Could not enforce 60 FPS controls: {e}")
+            self.frame_width, self.frame_height = 640, 480
             print("PiCamera2 started at target 60 FPS.")
         else:
             self.cap = cv2.VideoCapture(0)
             if not self.cap.isOpened():
                 raise ValueError("Could not open webcam.")
             try:
+                # Keep only the newest frame in the driver so reads aren't stale
+                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                # Match the Pi stream; MJPG lets USB webcams reach it
+                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
                 self.cap.set(cv2.CAP_PROP_FPS, 60)
             except Exception:
                 pass
@@ -173,6 +350,32 @@ class PendulumAngleEstimatorPi:
         print(f"Default Tracking Color: HSV[{h}, {s}, {v}]")
         print(f"Default Range: {self.lower_color} to {self.upper_color}")
 
+        # Luma mode: brightness window, also set by clicking a pin
+        self.y_lo = max(0, v - self.val_tolerance)
+        self.y_hi = min(255, v + self.val_tolerance)
+        if self.luma:
+            print(f"Default Luma Range: {self.y_lo} to {self.y_hi}")
+        self._set_bounds()
+
+        # 3x3 square for erode/dilate, built once
+        self._morph_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        if HAS_CUDA:
+            self._gpu_frame = cv2.cuda_GpuMat()
+            self._gpu_morph = []
+            if self.erode_iterations > 0:
+                self._gpu_morph.append(cv2.cuda.createMorphologyFilter(
+                    cv2.MORPH_ERODE, cv2.CV_8UC1, self._morph_kernel, iterations=self.erode_iterations))
+            if self.dilate_iterations > 0:
+                self._gpu_morph.append(cv2.cuda.createMorphologyFilter(
+                    cv2.MORPH_DILATE, cv2.CV_8UC1, self._morph_kernel, iterations=self.dilate_iterations))
+
+        # Range test + noise clean-up, chosen on the first frame (see _pick_mask)
+        self._segment = None
+        if mask_and_morph is not None:
+            # Compile (or load from cache) now, not on the first real frame
+            mask_and_morph(np.zeros((8, 8, 3), np.uint8), self.lower_color, self.upper_color,
+                           1, 1, np.empty((8, 8), np.uint8))
+
         self.prev_theta = 0.0
         self.alpha = 0.2  # Smoothing factor for angle filtering
         
@@ -182,73 +385,292 @@ class PendulumAngleEstimatorPi:
         # single_params: {"C": ...}
         # double_params: {"A": ..., "p": ...} or None
         
-        # Store current frame for mouse callback
-        self.current_frame = None
+        # Pending mouse click (x, y); the detector samples it from the next
+        # frame before drawing the overlay onto that frame
+        self._pick = None
+
+        # Output lines go through a logger thread so a slow terminal (e.g.
+        # over SSH) can't stall the tracking loop
+        self._log_q = queue.Queue(maxsize=256)
+        self.log_interval = 0.1  # Seconds between writes (~10 Hz)
+
+        # Capture -> detect -> serial/display pipeline. Small queues keep
+        # latency low: when a stage falls behind, the oldest item is dropped.
+        # On the Pi q_raw holds camera buffers, so it only keeps the newest.
+        self.q_raw = queue.Queue(maxsize=1)
+        self.q_out = queue.Queue(maxsize=2)
+        self.stop_event = threading.Event()
+        self._worker_error = None  # Raised again by run() once cleaned up
+
+        # The receiver only needs ~10 readings a second, and the mask
+        # thumbnail only needs refreshing every other frame
+        self.serial_interval = 0.1  # seconds
+        # One slot: a stalled UART holds back one value, never the loop
+        self._serial_q = queue.Queue(maxsize=1)
+        self._last_serial_t = 0.0
+        self._frame_idx = 0
+        self._preview = None
         
         # On Pi, we might not have a display, so we print to terminal mostly
         # But we'll keep imshow for VNC/Desktop preview
         self.window_name = "Pi Pendulum Tracker"
         
-        # Set up mouse callback for color picking
-        cv2.namedWindow(self.window_name)
-        cv2.setMouseCallback(self.window_name, self.mouse_callback)
+        if headless is None:
+            headless = not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+        self.headless = headless
+        self._quit = False  # Set by Ctrl+C in headless mode
+
+        if not self.headless:
+            # Set up mouse callback for color picking
+            cv2.namedWindow(self.window_name)
+            cv2.setMouseCallback(self.window_name, self.mouse_callback)
 
     def mouse_callback(self, event, x, y, flags, param):
         """Left Click: Pick the color at the clicked position for tracking"""
         if event == cv2.EVENT_LBUTTONDOWN:
-            if self.current_frame is None:
-                return
+            self._pick = (x, y)
+
+    def _pick_color(self, frame, x, y):
+        """Set the tracking range from the pixel at (x, y) of a clean frame"""
+        if self.luma:
+            # Frame is the Y plane: pick a brightness window instead
+            y_val = int(frame[y, x])
+            self.y_lo = max(0, y_val - self.val_tolerance)
+            self.y_hi = min(255, y_val + self.val_tolerance)
+            print(f"Luma picked at ({x}, {y}): Y={y_val}")
+            print(f"New Range: {self.y_lo} to {self.y_hi}")
+            self._set_bounds()
+            return
+
+        try:
+            # Convert the clicked point to HSV and extract color
+            hsv = cv2.cvtColor(frame[y:y+1, x:x+1], cv2.COLOR_BGR2HSV)
+            pixel = hsv[0, 0]
+            h, s, v = int(pixel[0]), int(pixel[1]), int(pixel[2])  # Explicitly convert to int
             
-            try:
-                # Convert the clicked point to HSV and extract color
-                hsv = cv2.cvtColor(self.current_frame, cv2.COLOR_BGR2HSV)
-                pixel = hsv[y, x]
-                h, s, v = int(pixel[0]), int(pixel[1]), int(pixel[2])  # Explicitly convert to int
-                
-                # Create a range using current tolerance settings
-                # Explicitly cast to uint8 to match OpenCV's expected type
-                self.lower_color = np.array([max(0, h-self.hue_tolerance), 
-                                            max(30, s-self.sat_tolerance), 
-                                            max(30, v-self.val_tolerance)], dtype=np.uint8)
-                self.upper_color = np.array([min(179, h+self.hue_tolerance), 
-                                            min(255, s+self.sat_tolerance), 
-                                            min(255, v+self.val_tolerance)], dtype=np.uint8)
-                
-                # Print the selected color for debugging
-                print(f"Color picked at ({x}, {y}): HSV[{h}, {s}, {v}]")
-                print(f"New Range: {self.lower_color} to {self.upper_color}")
-            except Exception as e:
-                print(f"Error in mouse callback: {e}")
+            # Create a range using current tolerance settings
+            # Explicitly cast to uint8 to match OpenCV's expected type
+            self.lower_color = np.array([max(0, h-self.hue_tolerance), 
+                                        max(30, s-self.sat_tolerance), 
+                                        max(30, v-self.val_tolerance)], dtype=np.uint8)
+            self.upper_color = np.array([min(179, h+self.hue_tolerance), 
+                                        min(255, s+self.sat_tolerance), 
+                                        min(255, v+self.val_tolerance)], dtype=np.uint8)
+            
+            # Print the selected color for debugging
+            print(f"Color picked at ({x}, {y}): HSV[{h}, {s}, {v}]")
+            print(f"New Range: {self.lower_color} to {self.upper_color}")
+            self._set_bounds()
+        except Exception as e:
+            print(f"Error picking color: {e}")
+
+    def _set_bounds(self):
+        """Cache the active range once per pick rather than rebuilding it per frame"""
+        if self.luma:
+            lo, hi = (self.y_lo,), (self.y_hi,)
+        else:
+            lo = tuple(int(c) for c in self.lower_color)
+            hi = tuple(int(c) for c in self.upper_color)
+        # OpenCV takes plain int tuples as a Scalar; the numba kernel needs arrays
+        self._lo, self._hi = lo, hi
+        self._lo_arr = np.array(lo, dtype=np.uint8)
+        self._hi_arr = np.array(hi, dtype=np.uint8)
 
     def get_frame(self):
+        """
+        Grab the next frame.
+
+        On the Pi this is the completed camera request itself, not a copy
+        of its buffer: the detector reads the frame in place (see
+        _track) and must release() the request when done with it.
+        """
         if HAS_PI_CAMERA:
-            # capture_array returns RGB, OpenCV uses BGR
-            frame_rgb = self.picam2.capture_array()
-            return cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
-        else:
-            ret, frame = self.cap.read()
-            return frame if ret else None
+            return self.picam2.capture_request()
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    @staticmethod
+    def _release(item):
+        """Hand a camera request back to libcamera (no-op for PC frames)"""
+        if HAS_PI_CAMERA and item is not None:
+            item.release()
+
+    def _track(self, item):
+        """process_frame() on whatever get_frame() returned"""
+        if not HAS_PI_CAMERA:
+            return self.process_frame(item)
+        try:
+            # Read-only view of the camera's DMA buffer. For YUV420 it is
+            # (H*3/2, stride) and the first H rows are the Y plane; BGR888
+            # is already in the channel order the pipeline expects.
+            with MappedArray(item, "main", write=False) as m:
+                return self.process_frame(m.array[:self.frame_height, :self.frame_width])
+        finally:
+            item.release()
+
+    def _log(self, text):
+        """Queue a line for the logger thread; drops it rather than block."""
+        try:
+            self._log_q.put_nowait(text)
+        except queue.Full:
+            pass
+
+    def _log_loop(self):
+        """Write queued lines to stdout, batching whatever has piled up."""
+        while True:
+            lines = [self._log_q.get()]
+            while not self._log_q.empty():
+                lines.append(self._log_q.get_nowait())
+            # Sentinel from run() on shutdown; a late line from a worker
+            # that outlived its join can land after it, so look at them all
+            done = None in lines
+            if done:
+                lines = [line for line in lines if line is not None]
+            if lines:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+            if done:
+                return
+            # Let lines pile up for a while: one write per batch, not per frame
+            time.sleep(self.log_interval)
+
+    def _on_sigint(self, signum, frame):
+        """Ctrl+C in headless mode: leave the loop and clean up normally"""
+        self._quit = True
 
     def send_serial(self, value):
         """
-        Send data over serial UART port
+        Send data over serial UART port (without blocking)
+        
+        The value is handed to the serial writer thread; if that thread is
+        still busy with an older value, the older one is dropped.
         
         Args:
             value: Float value to send (angle or wind speed)
         """
         if self.serial_port is None:
             return
-        
+        self._put_latest(self._serial_q, value)
+
+    def _serial_loop(self):
+        while True:
+            value = self._serial_q.get()
+            if value is None: break
+            self._write_serial(value)
+
+    def _write_serial(self, value):
         try:
             # Format message similar to CameraTest.py
             message = f"{value:.1f}\r\n"
+            # No flush(): waiting for the UART to drain would stall the loop;
+            # the OS sends the bytes and close() flushes what's left
             self.serial_port.write(message.encode("utf-8"))
-            self.serial_port.flush()  # Ensure all bytes are transmitted
         except serial.SerialTimeoutException:
             print("⚠️ Serial write timeout — the UART buffer may be full.")
         except Exception as e:
             print(f"Serial write error: {e}")
     
+    def _to_hsv(self, img):
+        # Luma mode already has the one channel it tests
+        return img if self.luma else cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+
+    def _mask_opencv(self, img, lo, hi):
+        return self._clean_mask(cv2.inRange(self._to_hsv(img), lo, hi))
+
+    def _mask_split(self, img, lo, hi):
+        # Progressive elimination: test hue on its own first; when no pixel
+        # passes (pins out of view) S and V are never looked at
+        h, s, v = cv2.split(self._to_hsv(img))
+        mask = cv2.inRange(h, lo[0], hi[0])
+        if cv2.countNonZero(mask):
+            cv2.bitwise_and(mask, cv2.inRange(s, lo[1], hi[1]), dst=mask)
+            cv2.bitwise_and(mask, cv2.inRange(v, lo[2], hi[2]), dst=mask)
+        return self._clean_mask(mask)
+
+    def _clean_mask(self, mask):
+        # Clean noise (adjust based on fast_motion mode), in place
+        kernel = self._morph_kernel
+        e, d = self.erode_iterations, self.dilate_iterations
+        if 0 < e <= d:
+            # Open = e erodes then e dilates, in one call
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, dst=mask, iterations=e)
+            d -= e
+        elif e > 0:
+            mask = cv2.erode(mask, kernel, dst=mask, iterations=e)
+        if d > 0:
+            mask = cv2.dilate(mask, kernel, dst=mask, iterations=d)
+        return mask
+
+    def _mask_fused(self, img, lo, hi):
+        # HSV conversion, range test, erode and dilate in one call that
+        # reads the BGR frame once
+        out = np.empty(img.shape[:2], dtype=np.uint8)
+        return mask_and_morph(img, self._lo_arr, self._hi_arr,
+                              self.erode_iterations, self.dilate_iterations, out)
+
+    def _mask_cuda(self, img, lo, hi):
+        # Whole segmentation on the GPU; only the final mask comes back
+        self._gpu_frame.upload(img[:, :, 0] if self.luma else img)
+        gpu = self._gpu_frame if self.luma else cv2.cuda.cvtColor(self._gpu_frame, cv2.COLOR_BGR2HSV)
+        gpu_mask = cv2.cuda.inRange(gpu, lo, hi)
+        for morph in self._gpu_morph:
+            gpu_mask = morph.apply(gpu_mask)
+        return gpu_mask.download()
+
+    def _mask_umat(self, img, lo, hi):
+        # Transparent API: OpenCV runs these on an OpenCL device
+        umat = cv2.UMat(img[:, :, 0] if self.luma else img)
+        mask = cv2.inRange(self._to_hsv(umat), lo, hi)
+        return self._clean_mask(mask).get()
+
+    def _pick_mask(self, img, lo, hi, repeats=5):
+        """
+        Return whichever mask method is fastest on this machine.
+
+        All give the same mask. The fused numba kernel reads the BGR frame
+        once, with no HSV image or intermediate masks written out, which
+        pays off on memory-bound boards;
+        OpenCV's SIMD code wins where bandwidth is plentiful. CUDA and OpenCL
+        are only offered when this OpenCV build and machine support them
+        (PC fallback; not on the Pi).
+        """
+        methods = {"OpenCV": self._mask_opencv}
+        if not self.luma:
+            methods["OpenCV split channels"] = self._mask_split
+        if mask_and_morph is not None:
+            methods["numba"] = self._mask_fused
+        if HAS_CUDA:
+            self._mask_cuda(img, lo, hi)  # Warm up the CUDA context
+            methods["CUDA"] = self._mask_cuda
+        if cv2.ocl.haveOpenCL():
+            self._mask_umat(img, lo, hi)  # Build the OpenCL kernels
+            methods["OpenCL"] = self._mask_umat
+        timings = {}
+        for name, method in methods.items():
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                method(img, lo, hi)
+            timings[name] = time.perf_counter() - t0
+        best = min(timings, key=timings.get)
+        print(f"Mask method: {best}")
+        return methods[best]
+
+    def _update_speed_model(self):
+        """
+        Cache the selected model's constants for calculate_wind_speed.
+
+        Call again whenever selected_model, double_params or
+        calibration_constant change.
+        """
+        self._speed_A = self._speed_p = None  # p None: single model, C * sqrt(tan)
+        if self.selected_model == "double" and self.double_params is not None:
+            try:
+                self._speed_A = float(self.double_params.get("A", 0.0))
+                self._speed_p = float(self.double_params.get("p", 0.5))
+            except (TypeError, ValueError):
+                # Unusable parameters: report 0 m/s, as before
+                self._speed_A, self._speed_p = 0.0, 0.5
+
     def calculate_wind_speed(self, angle_deg):
         """
         Calculate wind speed from pendulum angle using the selected model.
@@ -272,11 +694,9 @@ class PendulumAngleEstimatorPi:
             if tan_angle < 0:
                 return 0.0
 
-            # Model selection
-            if self.selected_model == "double" and self.double_params is not None:
-                A = float(self.double_params.get("A", 0.0))
-                p = float(self.double_params.get("p", 0.5))
-                wind_speed = A * (tan_angle ** p)
+            # Model selection (constants cached by _update_speed_model)
+            if self._speed_p is not None:
+                wind_speed = self._speed_A * (tan_angle ** self._speed_p)
                 return wind_speed
             else:
                 # Single-parameter fallback
@@ -286,13 +706,171 @@ class PendulumAngleEstimatorPi:
         except (ValueError, ZeroDivisionError):
             return 0.0
     
+    @staticmethod
+    def _put_latest(q, item, on_drop=None):
+        """Put item on q, dropping the oldest entry if q is full."""
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    old = q.get_nowait()
+                except queue.Empty:
+                    continue
+                if on_drop is not None:
+                    on_drop(old)
+
+    def _capture_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                frame = self.get_frame()
+                if frame is None: break
+                self._put_latest(self.q_raw, frame, on_drop=self._release)
+        except Exception as e:
+            self._worker_error = e
+        finally:
+            # Tell the detector we're done, even if the camera raised
+            self._put_latest(self.q_raw, None, on_drop=self._release)
+
+    def _detect_loop(self):
+        try:
+            while True:
+                frame = self.q_raw.get()
+                if frame is None: break
+                self._put_latest(self.q_out, self._track(frame))
+        except Exception as e:
+            # Don't leave run() waiting on a dead thread: stop capture too
+            self._worker_error = e
+            self.stop_event.set()
+        finally:
+            self._put_latest(self.q_out, None)  # Tell the output stage we're done
+
+    def process_frame(self, frame):
+        """
+        Find the two pins in a frame and update the smoothed angle.
+
+        Returns:
+            (display, value): the annotated preview (None when headless) and
+            the angle or wind speed to send over serial (None if not found)
+        """
+        # Colour picks are sampled here, before anything is drawn on frame
+        pick, self._pick = self._pick, None
+        if pick is not None:
+            self._pick_color(frame, *pick)
+        
+        # Track on a half-size copy (pyrDown: blur + decimate) so the mask
+        # pipeline touches 4x fewer pixels; centroids are scaled back up
+        small = cv2.pyrDown(frame)
+        
+        if self.luma:
+            # Brightness window on the Y plane, no colour conversion
+            img = small[:, :, None]
+        else:
+            img = small  # Mask methods do their own BGR->HSV conversion
+        lo, hi = self._lo, self._hi
+        
+        if self._segment is None:
+            self._segment = self._pick_mask(img, lo, hi)
+        mask = self._segment(img, lo, hi)
+        
+        # Label ALL blobs; areas and centroids come out of the same pass
+        n_labels, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8, ltype=cv2.CV_32S)
+        areas = stats[1:, cv2.CC_STAT_AREA]  # Label 0 is the background
+        
+        if self.headless:
+            display = None  # Nothing to draw on
+        elif self.luma:
+            display = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        elif HAS_PI_CAMERA:
+            # frame is the camera's own buffer, handed back once we return
+            display = frame.copy()
+        else:
+            # Each captured frame is used once, so draw straight onto it
+            display = frame
+        
+        value = None
+        points = []
+        if n_labels >= 3:
+            # Keep the two largest
+            for i in np.argpartition(areas, -2)[-2:]:
+                if areas[i] < self.min_area / 4: continue  # Use dynamic threshold (at half size)
+                
+                # Back to full-frame pixels
+                cx, cy = centroids[i + 1]
+                points.append((int(2 * cx), int(2 * cy)))
+            
+            if len(points) == 2:
+                # Sort by Y coordinate (Height)
+                points.sort(key=lambda p: p[1]) 
+                
+                top_pt = points[0] # Pivot
+                bot_pt = points[1] # Bob
+                
+                # Draw
+                if display is not None:
+                    cv2.circle(display, top_pt, 8, (255, 0, 0), -1)
+                    cv2.circle(display, bot_pt, 8, (0, 0, 255), -1)
+                    cv2.line(display, top_pt, bot_pt, (0, 255, 0), 2)
+                
+                # Calculate Angle
+                dx = bot_pt[0] - top_pt[0]
+                dy = bot_pt[1] - top_pt[1]
+                
+                # Plain floats: math is much cheaper than NumPy ufuncs on scalars
+                theta_deg = math.degrees(math.atan2(dx, dy))
+                
+                # Smooth
+                self.prev_theta += self.alpha * (theta_deg - self.prev_theta)
+                theta_smooth = self.prev_theta
+                
+                # Output based on mode
+                if self.output_mode == 'angle':
+                    # Print angle in format: angle:xx.x
+                    self._log(f"angle:{theta_smooth:.1f}")
+                    display_text = f"Angle: {theta_smooth:.1f} deg"
+                    # Send angle over serial
+                    value = theta_smooth
+                else:
+                    # Calculate and print wind speed (just the number)
+                    wind_speed = self.calculate_wind_speed(theta_smooth)
+                    self._log(f"{wind_speed:.1f}")
+                    display_text = f"Speed: {wind_speed:.1f} m/s (Angle: {theta_smooth:.1f})"
+                    # Send wind speed over serial
+                    value = wind_speed
+                
+                # Display on screen
+                if display is not None:
+                    cv2.putText(display, display_text, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        
+        if display is None:
+            return None, value
+
+        # Show mask preview in corner for debugging (optional but helpful),
+        # refreshed every other frame and pasted again in between
+        if self._preview is None or self._frame_idx % 2 == 0:
+            # Nearest: cheaper, and keeps the binary mask crisp
+            mask_small = cv2.resize(mask, (160, 120), interpolation=cv2.INTER_NEAREST)
+            self._preview = cv2.cvtColor(mask_small, cv2.COLOR_GRAY2BGR)
+        self._frame_idx += 1
+        display[0:120, 0:160] = self._preview
+        
+        # Add instruction text at bottom
+        cv2.putText(display, "Left-click to pick color", (20, display.shape[0] - 20), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return display, value
+
     def run(self):
         print("--- RASPBERRY PI PENDULUM TRACKER (INTERACTIVE MODE) ---")
         print("Instructions:")
         print("1. LEFT CLICK on one of the colored pins to set tracking color.")
         print("2. The script will find the TWO largest matching blobs.")
         print("3. Top blob = Pivot, Bottom blob = Bob.")
-        print("4. Press 'q' to quit.")
+        if self.headless:
+            print("4. Headless mode (no preview): press Ctrl+C to quit.")
+            signal.signal(signal.SIGINT, self._on_sigint)
+        else:
+            print("4. Press 'q' to quit.")
         print(f"Output Mode: {'ANGLE' if self.output_mode == 'angle' else 'WIND SPEED'}")
         if self.output_mode == 'speed':
             print(f"Calibration Constant C: {self.calibration_constant}")
@@ -304,96 +882,57 @@ class PendulumAngleEstimatorPi:
             print("Serial Output: DISABLED")
         print()
         
-        while True:
-            frame = self.get_frame()
-            if frame is None: break
-            
-            # Store frame for mouse callback
-            self.current_frame = frame
-            
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            mask = cv2.inRange(hsv, self.lower_color, self.upper_color)
-            
-            # Clean noise (adjust based on fast_motion mode)
-            kernel = np.ones((3,3), np.uint8)
-            if self.erode_iterations > 0:
-                mask = cv2.erode(mask, kernel, iterations=self.erode_iterations)
-            if self.dilate_iterations > 0:
-                mask = cv2.dilate(mask, kernel, iterations=self.dilate_iterations)
-            
-            # Find ALL contours
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Sort by area (largest first) and keep top 2
-            blobs = sorted(contours, key=cv2.contourArea, reverse=True)[:2]
-            
-            display = frame.copy()
-            
-            points = []
-            if len(blobs) >= 2:
-                for c in blobs:
-                    if cv2.contourArea(c) < self.min_area: continue  # Use dynamic threshold
-                    
-                    M = cv2.moments(c)
-                    if M["m00"] != 0:
-                        cx = int(M["m10"] / M["m00"])
-                        cy = int(M["m01"] / M["m00"])
-                        points.append((cx, cy))
-                
-                if len(points) == 2:
-                    # Sort by Y coordinate (Height)
-                    points.sort(key=lambda p: p[1]) 
-                    
-                    top_pt = points[0] # Pivot
-                    bot_pt = points[1] # Bob
-                    
-                    # Draw
-                    cv2.circle(display, top_pt, 8, (255, 0, 0), -1)
-                    cv2.circle(display, bot_pt, 8, (0, 0, 255), -1)
-                    cv2.line(display, top_pt, bot_pt, (0, 255, 0), 2)
-                    
-                    # Calculate Angle
-                    dx = bot_pt[0] - top_pt[0]
-                    dy = bot_pt[1] - top_pt[1]
-                    
-                    theta_rad = np.arctan2(dx, dy)
-                    theta_deg = np.degrees(theta_rad)
-                    
-                    # Smooth
-                    theta_smooth = (self.alpha * theta_deg) + ((1 - self.alpha) * self.prev_theta)
-                    self.prev_theta = theta_smooth
-                    
-                    # Output based on mode
-                    if self.output_mode == 'angle':
-                        # Print angle in format: angle:xx.x
-                        print(f"angle:{theta_smooth:.1f}")
-                        display_text = f"Angle: {theta_smooth:.1f} deg"
-                        # Send angle over serial
-                        self.send_serial(theta_smooth)
-                    else:
-                        # Calculate and print wind speed (just the number)
-                        wind_speed = self.calculate_wind_speed(theta_smooth)
-                        print(f"{wind_speed:.1f}")
-                        display_text = f"Speed: {wind_speed:.1f} m/s (Angle: {theta_smooth:.1f})"
-                        # Send wind speed over serial
-                        self.send_serial(wind_speed)
-                    
-                    # Display on screen
-                    cv2.putText(display, display_text, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-            
-            # Show mask preview in corner for debugging (optional but helpful)
-            mask_small = cv2.resize(mask, (160, 120))
-            display[0:120, 0:160] = cv2.cvtColor(mask_small, cv2.COLOR_GRAY2BGR)
-            
-            # Add instruction text at bottom
-            cv2.putText(display, "Left-click to pick color", (20, display.shape[0] - 20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
+        log_thread = threading.Thread(target=self._log_loop, daemon=True)
+        cap_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        det_thread = threading.Thread(target=self._detect_loop, daemon=True)
+        ser_thread = threading.Thread(target=self._serial_loop, daemon=True)
+        log_thread.start()
+        cap_thread.start()
+        det_thread.start()
+        if self.serial_port is not None:
+            ser_thread.start()
+
+        # Output stage: serial and GUI calls stay on the main thread
+        while not self._quit:
+            try:
+                item = self.q_out.get(timeout=0.05)
+            except queue.Empty:
+                # Keep the window responsive while waiting for a frame
+                if not self.headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+            if item is None: break
+            display, value = item
+
+            if value is not None:
+                now = time.monotonic()
+                if now - self._last_serial_t >= self.serial_interval:
+                    self.send_serial(value)
+                    self._last_serial_t = now
+
+            if display is None:
+                continue
+
             # Show
             cv2.imshow(self.window_name, display)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
-        
+
+        self.stop_event.set()
+        cap_thread.join(timeout=1.0)
+        det_thread.join(timeout=1.0)
+        # Hand back any camera buffers the detector never got to
+        while True:
+            try:
+                self._release(self.q_raw.get_nowait())
+            except queue.Empty:
+                break
+        self._log_q.put(None)  # Flush what's left and stop the logger
+        log_thread.join(timeout=1.0)
+        if ser_thread.is_alive():
+            self._put_latest(self._serial_q, None)
+            ser_thread.join(timeout=3.0)  # Longer than the 2 s write timeout
+
         if HAS_PI_CAMERA:
             self.picam2.stop()
         else:
@@ -407,7 +946,11 @@ class PendulumAngleEstimatorPi:
             except Exception as e:
                 print(f"Error closing serial port: {e}")
         
-        cv2.destroyAllWindows()
+        if not self.headless:
+            cv2.destroyAllWindows()
+
+        if self._worker_error is not None:
+            raise self._worker_error
 
 if __name__ == "__main__":
     # Parse command-line arguments
@@ -424,6 +967,10 @@ if __name__ == "__main__":
                        help='Serial baud rate (default: 115200)')
     parser.add_argument('--model', type=str, choices=['auto', 'single', 'double'], default='auto',
                        help="Model choice for calibration: 'auto' (use recommended), 'single', or 'double'")
+    parser.add_argument('--luma', action='store_true',
+                       help='Track pins by brightness on the Y plane of a YUV420 stream instead of HSV colour (Pi camera only)')
+    parser.add_argument('--headless', '--no-preview', dest='headless', action='store_true', default=None,
+                       help='No preview window (default: headless automatically when DISPLAY/WAYLAND_DISPLAY is unset)')
     
     args = parser.parse_args()
     
@@ -437,6 +984,8 @@ if __name__ == "__main__":
                                          fast_motion=args.fast,
                                          serial_port=serial_port,
                                          serial_baud=args.baud,
-                                         model_choice=args.model)
+                                         model_choice=args.model,
+                                         luma=args.luma,
+                                         headless=args.headless)
     estimator.run()
 